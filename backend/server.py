@@ -1,38 +1,290 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, status
+from fastapi import FastAPI, APIRouter, BackgroundTasks, HTTPException, Depends, UploadFile, File, Form, Header, Query, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.middleware.gzip import GZipMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from bson import ObjectId
+from bson.errors import InvalidId
+import gridfs
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
+from pymongo.read_preferences import SecondaryPreferred
 import os
 import logging
+from abc import ABC, abstractmethod
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import AsyncIterator, List, Literal, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
+from email.utils import parsedate_to_datetime
 import bcrypt
 import jwt
 import io
 import pandas as pd
 import base64
+import json
+import asyncio
+import contextvars
+import socket
+import threading
+import time
+import tempfile
+import csv
+import functools
+import gzip
+import hashlib
+import heapq
+import hmac
+import ipaddress
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import openpyxl
+import orjson
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics Settings
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1.0))
+SLOW_REQUEST_MAX_COMMANDS = 50
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token for /metrics; unset disables the endpoint
+
+class RequestMetrics:
+    """Mongo commands issued while serving one request"""
+
+    def __init__(self):
+        self.db_commands = 0
+        self.db_seconds = 0.0
+        self.commands = []
+        self.pending = {}  # request_id -> collection, between started and finished
+
+# Motor runs PyMongo calls on its executor with a copy of the caller's context, so the
+# listener thread sees the RequestMetrics object of the request that issued the command
+current_request_metrics = contextvars.ContextVar("current_request_metrics", default=None)
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        metrics = current_request_metrics.get()
+        if metrics is not None:
+            metrics.pending[event.request_id] = event.command.get(event.command_name)
+
+    def _finished(self, event, outcome: str):
+        seconds = event.duration_micros / 1e6
+        metrics_registry.observe_db_command(event.command_name, seconds)
+        metrics = current_request_metrics.get()
+        if metrics is not None:
+            target = metrics.pending.pop(event.request_id, None)
+            metrics.db_commands += 1
+            metrics.db_seconds += seconds
+            if len(metrics.commands) < SLOW_REQUEST_MAX_COMMANDS:
+                command = f"{event.command_name} {target}" if isinstance(target, str) else event.command_name
+                metrics.commands.append(f"{command} {seconds * 1000:.1f}ms {outcome}")
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "failed")
+
+class ConnectionPoolMonitor(monitoring.ConnectionPoolListener):
+    """Per-server connection counts of this worker's pool, kept from PyMongo's pool events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pools = {}
+
+    def _add(self, event, **deltas):
+        # Events arrive on driver and executor threads
+        with self._lock:
+            pool = self.pools.setdefault(
+                f"{event.address[0]}:{event.address[1]}",
+                {"open": 0, "in_use": 0, "waiting": 0, "checkout_failures": 0}
+            )
+            for key, delta in deltas.items():
+                pool[key] += delta
+
+    def pool_created(self, event):
+        self._add(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        self._add(event, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(event, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(event, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(event, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(event, waiting=-1, in_use=1)
+
+    def connection_checked_in(self, event):
+        self._add(event, in_use=-1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                address: {**pool, "max": MONGO_MAX_POOL_SIZE, "utilization": round(pool["in_use"] / MONGO_MAX_POOL_SIZE, 3)}
+                for address, pool in self.pools.items()
+            }
+
+# MongoDB Pool Settings (per worker process; these override the same options in MONGO_URL)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 50))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 300000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 5000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 0)) or None  # 0: no timeout
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')  # e.g. zstd,snappy,zlib; zstd/snappy need zstandard/python-snappy
+
+# Read Routing Settings (read-heavy routes may use secondaries this far behind; 0 keeps every read on the primary)
+MONGO_SECONDARY_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_SECONDARY_MAX_STALENESS_SECONDS', 0))
+if 0 < MONGO_SECONDARY_MAX_STALENESS_SECONDS < 90:
+    raise RuntimeError("MONGO_SECONDARY_MAX_STALENESS_SECONDS deve ser 0 ou pelo menos 90")
+SECONDARY_READ_PREFERENCE = (
+    SecondaryPreferred(max_staleness=MONGO_SECONDARY_MAX_STALENESS_SECONDS)
+    if MONGO_SECONDARY_MAX_STALENESS_SECONDS else None
+)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+pool_monitor = ConnectionPoolMonitor()
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    **({"compressors": MONGO_COMPRESSORS} if MONGO_COMPRESSORS else {}),
+    event_listeners=[MongoCommandListener(), pool_monitor]
+)
 db = client[os.environ['DB_NAME']]
 
+def secondary_reads(collection):
+    """The collection routed to secondaries within the staleness bound, when read routing is enabled"""
+    if SECONDARY_READ_PREFERENCE is None:
+        return collection
+    return collection.with_options(read_preference=SECONDARY_READ_PREFERENCE)
+
 # JWT Settings
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440
+# EventSource can only send a token in the URL, which proxies log; it gets a short-lived one scoped to the stream
+STREAM_TOKEN_EXPIRE_SECONDS = 60
+STREAM_TOKEN_SCOPE = "notifications:stream"
+
+# Authenticated-user cache (per worker). No route edits users, so the TTL alone bounds how long a
+# role change or deletion made in the database takes to reach a worker.
+USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', 1024))
+
+# Password Hashing Settings (bcrypt runs off the event loop on a dedicated pool)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+
+# Login Rate Limit Settings (token buckets: burst size and tokens refilled per minute)
+LOGIN_RATE_LIMIT_USERNAME_BURST = int(os.environ.get('LOGIN_RATE_LIMIT_USERNAME_BURST', 5))
+LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE = float(os.environ.get('LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE', 5))
+LOGIN_RATE_LIMIT_IP_BURST = int(os.environ.get('LOGIN_RATE_LIMIT_IP_BURST', 30))
+LOGIN_RATE_LIMIT_IP_PER_MINUTE = float(os.environ.get('LOGIN_RATE_LIMIT_IP_PER_MINUTE', 30))
+
+# Public Routes Rate Limit Settings (per client IP, shared by every /api/public/* route)
+PUBLIC_RATE_LIMIT_BURST = int(os.environ.get('PUBLIC_RATE_LIMIT_BURST', 30))
+PUBLIC_RATE_LIMIT_PER_MINUTE = float(os.environ.get('PUBLIC_RATE_LIMIT_PER_MINUTE', 60))
+
+# Trusted Proxy Settings (comma-separated IPs/CIDRs whose X-Forwarded-For is honored; "*" trusts the direct peer only)
+TRUSTED_PROXIES = [proxy.strip() for proxy in os.environ.get('TRUSTED_PROXIES', '').split(',') if proxy.strip()]
+TRUSTED_PROXY_NETWORKS = [ipaddress.ip_network(proxy, strict=False) for proxy in TRUSTED_PROXIES if proxy != "*"]
+
+# Notification Push Settings (memory: single worker; changestream: fan-out across workers, needs a replica set)
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'memory')
+NOTIFICATION_KEEPALIVE_SECONDS = 15
+NOTIFICATION_QUEUE_SIZE = 100
+
+# Public Catalog Settings (per-worker cache; other workers' writes show up after the TTL)
+PUBLIC_CATALOG_TTL_SECONDS = int(os.environ.get('PUBLIC_CATALOG_TTL_SECONDS', 30))
+
+# Pagination Settings
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+BULK_WRITE_BATCH_SIZE = 1000
+BULK_OPERATION_MAX_ITEMS = 5000
+
+# Response Compression Settings (gzip only pays off above a few KB)
+GZIP_MINIMUM_SIZE = int(os.environ.get('GZIP_MINIMUM_SIZE', 1024))
+GZIP_COMPRESS_LEVEL = 6
+
+# Spreadsheet Settings (pandas/openpyxl work runs on a bounded pool; excess requests wait in a queue)
+SPREADSHEET_WORKERS = int(os.environ.get('SPREADSHEET_WORKERS', 2))
+SPREADSHEET_QUEUE_SIZE = int(os.environ.get('SPREADSHEET_QUEUE_SIZE', 16))
+SPREADSHEET_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('SPREADSHEET_QUEUE_TIMEOUT_SECONDS', 30))
+
+# Termo Storage Settings
+TERMO_STORAGE = os.environ.get('TERMO_STORAGE', 'gridfs')  # gridfs, local
+TERMO_STORAGE_PATH = Path(os.environ.get('TERMO_STORAGE_PATH', ROOT_DIR / 'termos'))
+TERMO_CHUNK_SIZE = 1024 * 1024
+
+# Scheduler Settings
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+OVERDUE_SWEEP_INTERVAL_SECONDS = int(os.environ.get('OVERDUE_SWEEP_INTERVAL_SECONDS', 300))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Retention Settings (0 disables the read-notification TTL / history archival)
+NOTIFICATION_READ_TTL_DAYS = int(os.environ.get('NOTIFICATION_READ_TTL_DAYS', 30))
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 365))
+HISTORY_ARCHIVE = os.environ.get('HISTORY_ARCHIVE', 'collection')  # collection, file
+HISTORY_ARCHIVE_PATH = Path(os.environ.get('HISTORY_ARCHIVE_PATH', ROOT_DIR / 'history_archive'))
+HISTORY_ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('HISTORY_ARCHIVE_INTERVAL_SECONDS', 86400))
+
+# Report Settings (results are cached per window)
+REPORT_CACHE_TTL_SECONDS = int(os.environ.get('REPORT_CACHE_TTL_SECONDS', 300))
+REPORT_DEFAULT_WINDOW_DAYS = 90
+
+# Search Settings
+SEARCH_FIELDS = {
+    "equipments": ["numero_patrimonio", "numero_serie", "marca", "modelo"],
+    "loans": ["nome_solicitante", "departamento_solicitante"],
+}
+
+# Fields that never leave the database on reads (legacy inline PDFs, blob store keys, search tokens)
+EQUIPMENT_PROJECTION = {"_id": 0, "termo_responsabilidade": 0, "termo_file_id": 0, "search_words": 0, "search_grams": 0}
+LOAN_PROJECTION = {
+    "_id": 0, "search_words": 0, "search_grams": 0, "overdue_sweep": 0,
+    "data_emprestimo_dt": 0, "data_prevista_devolucao_dt": 0, "data_devolucao_real_dt": 0
+}
 
 security = HTTPBearer()
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Models
@@ -61,11 +313,34 @@ class Equipment(BaseModel):
     tipo_equipamento: str
     departamento_atual: str
     responsavel_atual: Optional[str] = None
-    termo_responsabilidade: Optional[str] = None  # Base64 PDF
+    has_termo: bool = False
     status: str = "Disponível"  # Disponível, Em uso, Emprestado, Manutenção, Baixado
+    version: int = 0  # bumped by every write to editable fields; sent back as ETag / If-Match
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
     updated_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
+EQUIPMENT_STATUSES = ["Disponível", "Em uso", "Emprestado", "Manutenção", "Baixado"]
+
+class EquipmentPage(BaseModel):
+    items: List[Equipment]
+    next_cursor: Optional[str] = None
+
+class PublicEquipment(BaseModel):
+    """Only what the public loan request form shows"""
+    model_config = ConfigDict(extra="ignore")
+    id: str
+    numero_patrimonio: str
+    marca: str
+    modelo: str
+    tipo_equipamento: str
+    departamento_atual: str
+
+PUBLIC_EQUIPMENT_PROJECTION = {"_id": 0, **{field: 1 for field in PublicEquipment.model_fields}}
+
+class PublicEquipmentPage(BaseModel):
+    items: List[PublicEquipment]
+    next_cursor: Optional[str] = None
+
 class EquipmentCreate(BaseModel):
     numero_patrimonio: str
     numero_serie: str
@@ -85,6 +360,33 @@ class EquipmentUpdate(BaseModel):
     responsavel_atual: Optional[str] = None
     status: Optional[str] = None
 
+class EquipmentBulkFilter(BaseModel):
+    tipo: Optional[str] = None
+    departamento: Optional[str] = None
+    status: Optional[str] = None
+    search: Optional[str] = None
+
+class EquipmentBulkRequest(BaseModel):
+    operation: Literal["status", "transfer", "delete"]
+    ids: Optional[List[str]] = None  # either ids or filter selects the equipments
+    filter: Optional[EquipmentBulkFilter] = None
+    status: Optional[str] = None  # operation "status"
+    departamento_atual: Optional[str] = None  # operation "transfer"
+    responsavel_atual: Optional[str] = None  # operation "transfer", optional
+
+class EquipmentBulkItemResult(BaseModel):
+    id: str
+    numero_patrimonio: Optional[str] = None
+    ok: bool
+    detail: Optional[str] = None
+
+class EquipmentBulkResult(BaseModel):
+    operation: str
+    matched: int
+    succeeded: int
+    failed: int
+    results: List[EquipmentBulkItemResult]
+
 class LoanEquipment(BaseModel):
     numero_patrimonio: str
 
@@ -100,6 +402,10 @@ class Loan(BaseModel):
     equipments: List[str]  # Lista de números de patrimônio
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
+class LoanPage(BaseModel):
+    items: List[Loan]
+    next_cursor: Optional[str] = None
+
 class LoanCreate(BaseModel):
     data_emprestimo: str
     nome_solicitante: str
@@ -110,6 +416,9 @@ class LoanCreate(BaseModel):
 class LoanReturn(BaseModel):
     data_devolucao_real: str
 
+class NotificationReadRequest(BaseModel):
+    ids: Optional[List[str]] = None  # None marks every notification as read
+
 class Notification(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -119,6 +428,23 @@ class Notification(BaseModel):
     read: bool = False
     created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
+class ImportJob(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: str
+    user: str
+    status: str = "queued"  # queued, running, completed, failed
+    rows_processed: int = 0
+    success_count: int = 0
+    error_count: int = 0
+    errors: List[str] = []
+    detail: Optional[str] = None
+    created_at: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    worker_id: Optional[str] = None
+    heartbeat_at: Optional[str] = None
+
 class EquipmentHistory(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -126,32 +452,303 @@ class EquipmentHistory(BaseModel):
     action: str
     description: str
     user: str
+    changes: Optional[dict] = None  # field -> {"from": old, "to": new} for edits
     timestamp: str = Field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
 
+class EquipmentHistoryPage(BaseModel):
+    items: List[EquipmentHistory]
+    next_cursor: Optional[str] = None
+
+# List routes read exactly the model's fields, so their pages are returned without
+# FastAPI validating every document against the response model a second time
+def model_projection(model) -> dict:
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+def model_defaults(model) -> dict:
+    """Constant defaults of a model; list routes skip validation, so stored documents must carry them"""
+    return {
+        name: field.default for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+
+EQUIPMENT_LIST_PROJECTION = model_projection(Equipment)
+LOAN_LIST_PROJECTION = model_projection(Loan)
+
 # Helper Functions
+class TTLCache:
+    """In-process TTL/LRU cache keyed by string (user records, report results)"""
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: dict):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None
+        }
+
+user_cache = TTLCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_SIZE)
+
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    hashed = await loop.run_in_executor(password_executor, bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    return hashed.decode('utf-8')
+
+async def verify_password(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+class RateLimiter:
+    """In-process token buckets keyed by an arbitrary string (username, client IP, ...)"""
+
+    def __init__(self, burst: int, per_minute: float, max_keys: int = 10000):
+        self.burst = burst
+        self.rate = per_minute / 60
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def acquire(self, key: str, take: bool = True) -> float:
+        """Take one token (or, with take=False, only look for one); returns 0 when allowed,
+        otherwise the seconds until a token is available"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1 if take else tokens, now)
+            retry_after = 0
+        else:
+            self._buckets[key] = (tokens, now)
+            retry_after = (1 - tokens) / self.rate if self.rate else 60
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    def check(self, key: str, take: bool = True):
+        retry_after = self.acquire(key, take)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Muitas tentativas. Tente novamente mais tarde",
+                headers={"Retry-After": str(int(retry_after) + 1)}
+            )
+
+login_username_limiter = RateLimiter(LOGIN_RATE_LIMIT_USERNAME_BURST, LOGIN_RATE_LIMIT_USERNAME_PER_MINUTE)
+login_ip_limiter = RateLimiter(LOGIN_RATE_LIMIT_IP_BURST, LOGIN_RATE_LIMIT_IP_PER_MINUTE)
+public_ip_limiter = RateLimiter(PUBLIC_RATE_LIMIT_BURST, PUBLIC_RATE_LIMIT_PER_MINUTE)
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXY_NETWORKS)
+
+def client_ip(request: Request) -> str:
+    """Rate-limit key: the peer address, or the client a trusted proxy reports in X-Forwarded-For"""
+    host = request.client.host if request.client else "unknown"
+    if not ("*" in TRUSTED_PROXIES or is_trusted_proxy(host)):
+        return host
+    hops = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+    # Proxies append, so walk back from the nearest hop; anything left of the first untrusted one may be forged
+    for hop in reversed(hops):
+        host = hop
+        if not is_trusted_proxy(hop):
+            break
+    return host
+
+async def check_public_rate_limit(request: Request):
+    public_ip_limiter.check(client_ip(request))
+
+class PublicCatalog:
+    """Available equipments for the public form, cached in memory and rebuilt after any equipment write"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.items = []
+        self.etag = None
+        self.last_modified = None
+        self._expires_at = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._expires_at = 0
+
+    async def get(self) -> "PublicCatalog":
+        if self._expires_at > time.monotonic():
+            return self
+        async with self._lock:
+            # Concurrent misses wait here and reuse the first rebuild
+            if self._expires_at <= time.monotonic():
+                await self._rebuild()
+        return self
+
+    async def _rebuild(self):
+        expires_at = time.monotonic() + self.ttl_seconds
+        items = await secondary_reads(db.equipments).find(
+            {"status": "Disponível"},
+            PUBLIC_EQUIPMENT_PROJECTION
+        ).sort([("tipo_equipamento", ASCENDING), ("numero_patrimonio", ASCENDING)]).to_list(None)
+        digest = hashlib.sha1(json.dumps(items, sort_keys=True).encode('utf-8')).hexdigest()
+        etag = f'W/"{digest}"'
+        if etag != self.etag:
+            self.items = items
+            self.etag = etag
+            self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self._expires_at = expires_at
+
+public_catalog = PublicCatalog(PUBLIC_CATALOG_TTL_SECONDS)
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def create_stream_token(user_id: str) -> str:
+    expire = datetime.now(timezone.utc) + timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    return jwt.encode({"sub": user_id, "scope": STREAM_TOKEN_SCOPE, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+async def authenticate_token(token: str, scope: Optional[str] = None) -> dict:
+    """Resolve a JWT to its user; scoped tokens are only accepted where that scope is expected"""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("scope") != scope:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        user = user_cache.get(user_id)
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
+            user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+            if user is None:
+                raise HTTPException(status_code=401, detail="User not found")
+            user_cache.set(user_id, user)
         return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Apenas administradores")
+    return current_user
+
+class NotificationBroker:
+    """In-process pub/sub delivering new notifications to the SSE streams of this worker"""
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=NOTIFICATION_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[user_id]
+
+    def deliver(self, notification: dict):
+        notification = {key: value for key, value in notification.items() if key != "_id"}
+        for queue in self._subscribers.get(notification["user_id"], ()):
+            try:
+                queue.put_nowait(notification)
+            except asyncio.QueueFull:
+                # A stalled client only loses live pushes; the list endpoint still has everything
+                pass
+
+    async def publish(self, notifications: List[dict]):
+        for notification in notifications:
+            self.deliver(notification)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class ChangeStreamNotificationBroker(NotificationBroker):
+    """Fans out inserts seen on a MongoDB change stream, so every worker pushes to its own clients"""
+
+    def __init__(self):
+        super().__init__()
+        self._task = None
+
+    async def publish(self, notifications: List[dict]):
+        # The insert itself is the message; the change stream delivers it to every worker
+        pass
+
+    async def start(self):
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _watch(self):
+        resume_token = None
+        while True:
+            try:
+                async with db.notifications.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=resume_token
+                ) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.deliver(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification change stream failed, reconnecting")
+                await asyncio.sleep(5)
+
+def get_notification_broker() -> NotificationBroker:
+    if NOTIFICATION_BROKER == "changestream":
+        return ChangeStreamNotificationBroker()
+    return NotificationBroker()
+
+notification_broker = get_notification_broker()
+
 async def create_notification(user_id: str, message: str, notification_type: str):
     notification = Notification(
         user_id=user_id,
@@ -159,25 +756,890 @@ async def create_notification(user_id: str, message: str, notification_type: str
         type=notification_type
     )
     await db.notifications.insert_one(notification.model_dump())
+    await notification_broker.publish([notification.model_dump()])
+
+async def create_notifications(notifications: List[Notification]):
+    docs = [notification.model_dump() for notification in notifications]
+    for offset in range(0, len(docs), BULK_WRITE_BATCH_SIZE):
+        # insert_many adds _id to the dicts it is given, so it gets copies
+        await db.notifications.insert_many([dict(doc) for doc in docs[offset:offset + BULK_WRITE_BATCH_SIZE]], ordered=False)
+    await notification_broker.publish(docs)
+
+async def notify_admins(message: str, notification_type: str):
+    """Send one notification to every admin with a single insert_many"""
+    admin_users = await db.users.find({"role": "admin"}, {"_id": 0, "id": 1}).to_list(None)
+    await create_notifications([
+        Notification(user_id=admin["id"], message=message, type=notification_type)
+        for admin in admin_users
+    ])
 
-async def create_history_entry(equipment_id: str, action: str, description: str, user: str):
+async def create_history_entry(equipment_id: str, action: str, description: str, user: str, changes: Optional[dict] = None):
     history = EquipmentHistory(
         equipment_id=equipment_id,
         action=action,
         description=description,
-        user=user
+        user=user,
+        changes=changes
     )
     await db.equipment_history.insert_one(history.model_dump())
 
+async def create_history_entries(entries: List[EquipmentHistory]):
+    for offset in range(0, len(entries), BULK_WRITE_BATCH_SIZE):
+        await db.equipment_history.insert_many(
+            [entry.model_dump() for entry in entries[offset:offset + BULK_WRITE_BATCH_SIZE]],
+            ordered=False
+        )
+
+def encode_cursor(doc: dict, sort_field: str = "created_at") -> str:
+    raw = json.dumps([doc[sort_field], doc["id"]]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(sort_value), str(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def apply_cursor(query: dict, cursor: Optional[str], sort_field: str = "created_at") -> dict:
+    """Restrict a query to documents after the cursor in (sort_field, id) descending order"""
+    if not cursor:
+        return query
+    sort_value, doc_id = decode_cursor(cursor)
+    keyset = {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, "id": {"$lt": doc_id}}
+    ]}
+    return {"$and": [query, keyset]} if query else keyset
+
+def encode_offset_cursor(offset: int) -> str:
+    """Position in a ranked or in-memory result (search, public catalog), where no keyset exists"""
+    raw = json.dumps({"offset": offset}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip("=")
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded))["offset"]
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError(offset)
+        return offset
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+async def fetch_page(
+    collection, query: dict, projection: dict, limit: int, cursor: Optional[str], sort_field: str = "created_at"
+) -> dict:
+    docs = await collection.find(apply_cursor(query, cursor, sort_field), projection).sort(
+        [(sort_field, -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], sort_field) if len(docs) > limit else None
+    return {"items": docs[:limit], "next_cursor": next_cursor}
+
+def stream_ndjson(collection, query: dict, projection: dict, cursor: Optional[str]) -> StreamingResponse:
+    """Stream every matching document as NDJSON, reading the Motor cursor batch by batch"""
+    async def generate():
+        db_cursor = collection.find(apply_cursor(query, cursor), projection).sort(
+            [("created_at", -1), ("id", -1)]
+        ).batch_size(STREAM_BATCH_SIZE)
+        async for doc in db_cursor:
+            yield orjson.dumps(doc, default=str) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# Search
+def fold_text(text: str) -> List[str]:
+    """Lowercase, strip accents and split on anything that is not a letter or digit"""
+    normalized = unicodedata.normalize("NFKD", text)
+    ascii_text = "".join(ch for ch in normalized if not unicodedata.combining(ch)).lower()
+    return re.findall(r"[a-z0-9]+", ascii_text)
+
+def trigrams(word: str) -> List[str]:
+    return [word[i:i + 3] for i in range(len(word) - 2)]
+
+def search_fields(doc: dict, fields: List[str]) -> dict:
+    """Accent-folded words and trigrams of the searchable fields, stored alongside the document"""
+    words = set()
+    for field in fields:
+        field_words = fold_text(str(doc.get(field) or ""))
+        words.update(field_words)
+        # "PAT-001" is also indexed as "pat001" so searches typed without separators still match
+        if len(field_words) > 1:
+            words.add("".join(field_words))
+    grams = {gram for word in words for gram in trigrams(word)}
+    return {"search_words": sorted(words), "search_grams": sorted(grams)}
+
+def build_search_filter(search: str) -> Optional[dict]:
+    """Index-backed filter: every term of 3+ chars must be a substring of a word, shorter terms must prefix one"""
+    terms = fold_text(search)
+    if not terms:
+        return None
+    clauses = []
+    grams = sorted({gram for term in terms for gram in trigrams(term)})
+    if grams:
+        clauses.append({"search_grams": {"$all": grams}})
+    # The trigram index narrows the candidates, but the grams may come from different words
+    # ("mo-del" + "sate-ll-ite" hold every gram of "dell"), so each term is rechecked against
+    # the words; folded terms are [a-z0-9]+ and need no escaping
+    for term in terms:
+        clauses.append({"search_words": {"$regex": term if len(term) >= 3 else f"^{term}"}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+def search_score(search: str) -> dict:
+    """Rank per term: exact word 3, word prefix 2, substring 1"""
+    scores = []
+    for term in fold_text(search):
+        # Folded terms are [a-z0-9]+, so the anchored pattern needs no escaping
+        prefix_match = {"$in": [True, {"$map": {
+            "input": "$search_words",
+            "in": {"$regexMatch": {"input": "$$this", "regex": f"^{term}"}}
+        }}]}
+        scores.append({"$cond": [
+            {"$in": [term, "$search_words"]}, 3,
+            {"$cond": [prefix_match, 2, 1]}
+        ]})
+    return {"$add": scores}
+
+async def fetch_search_page(collection, query: dict, search: str, projection: dict, limit: int, cursor: Optional[str]) -> dict:
+    """Ranked page of search results; the cursor carries the offset into the ranking"""
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    docs = await collection.aggregate([
+        {"$match": query},
+        {"$addFields": {"search_score": search_score(search)}},
+        {"$sort": {"search_score": -1, "created_at": -1, "id": -1}},
+        {"$skip": offset},
+        {"$limit": limit + 1},
+        {"$project": search_result_projection(projection)}
+    ], allowDiskUse=True).to_list(limit + 1)
+    next_cursor = encode_offset_cursor(offset + limit) if len(docs) > limit else None
+    return {"items": docs[:limit], "next_cursor": next_cursor}
+
+def search_result_projection(projection: dict) -> dict:
+    # An inclusion projection already leaves the score out, and cannot also exclude fields
+    if any(value == 1 for field, value in projection.items() if field != "_id"):
+        return projection
+    return {**projection, "search_score": 0}
+
+async def backfill_search_fields():
+    """Populate search tokens on documents written before search indexing existed"""
+    for collection_name, fields in SEARCH_FIELDS.items():
+        collection = db[collection_name]
+        updates = []
+        async for doc in collection.find({"search_words": {"$exists": False}}, {"_id": 0, "id": 1, **{f: 1 for f in fields}}):
+            updates.append(UpdateOne({"id": doc["id"]}, {"$set": search_fields(doc, fields)}))
+            if len(updates) == BULK_WRITE_BATCH_SIZE:
+                await collection.bulk_write(updates, ordered=False)
+                updates = []
+        if updates:
+            await collection.bulk_write(updates, ordered=False)
+
+# Termo Storage
+class TermoStore(ABC):
+    """Blob store for termo de responsabilidade PDFs, written and read in chunks"""
+
+    @abstractmethod
+    async def save(self, filename: str, chunks: AsyncIterator[bytes]) -> tuple:
+        """Persist the chunks and return (file_id, size)"""
+
+    @abstractmethod
+    def read(self, file_id: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield the bytes in the inclusive range [start, end]"""
+
+    @abstractmethod
+    async def delete(self, file_id: str):
+        """Remove a stored file; missing files are ignored"""
+
+class GridFSTermoStore(TermoStore):
+    bucket_name = "termos"
+
+    def _bucket(self):
+        return AsyncIOMotorGridFSBucket(db, bucket_name=self.bucket_name, chunk_size_bytes=255 * 1024)
+
+    async def save(self, filename: str, chunks: AsyncIterator[bytes]) -> tuple:
+        grid_in = self._bucket().open_upload_stream(filename, metadata={"contentType": "application/pdf"})
+        size = 0
+        try:
+            async for chunk in chunks:
+                await grid_in.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return str(grid_in._id), size
+
+    async def read(self, file_id: str, start: int, end: int) -> AsyncIterator[bytes]:
+        grid_out = await self._bucket().open_download_stream(ObjectId(file_id))
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await grid_out.read(min(TERMO_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, file_id: str):
+        try:
+            await self._bucket().delete(ObjectId(file_id))
+        except (gridfs.errors.NoFile, InvalidId):
+            pass
+
+class LocalTermoStore(TermoStore):
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, file_id: str) -> Path:
+        return self.root / f"{uuid.UUID(file_id)}.pdf"
+
+    async def save(self, filename: str, chunks: AsyncIterator[bytes]) -> tuple:
+        self.root.mkdir(parents=True, exist_ok=True)
+        file_id = str(uuid.uuid4())
+        path = self._path(file_id)
+        size = 0
+        try:
+            with open(path, "wb") as f:
+                async for chunk in chunks:
+                    await run_in_threadpool(f.write, chunk)
+                    size += len(chunk)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        return file_id, size
+
+    async def read(self, file_id: str, start: int, end: int) -> AsyncIterator[bytes]:
+        with open(self._path(file_id), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(TERMO_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    async def delete(self, file_id: str):
+        try:
+            self._path(file_id).unlink(missing_ok=True)
+        except ValueError:
+            pass
+
+def get_termo_store() -> TermoStore:
+    if TERMO_STORAGE == "local":
+        return LocalTermoStore(TERMO_STORAGE_PATH)
+    if TERMO_STORAGE == "gridfs":
+        return GridFSTermoStore()
+    raise RuntimeError(f"TERMO_STORAGE desconhecido: {TERMO_STORAGE}")
+
+termo_store = get_termo_store()
+
+async def upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(TERMO_CHUNK_SIZE):
+        yield chunk
+
+async def bytes_chunks(content: bytes) -> AsyncIterator[bytes]:
+    for offset in range(0, len(content), TERMO_CHUNK_SIZE):
+        yield content[offset:offset + TERMO_CHUNK_SIZE]
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """Parse a single 'bytes=start-end' range into an inclusive (start, end) tuple"""
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise HTTPException(status_code=416, detail="Range inválido", headers={"Content-Range": f"bytes */{size}"})
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = min(int(end_s), size - 1) if end_s else size - 1
+        else:
+            start = max(size - int(end_s), 0)
+            end = size - 1
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Range inválido", headers={"Content-Range": f"bytes */{size}"})
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range inválido", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+async def migrate_inline_termos():
+    """Move base64 termos stored inline in equipment documents into the termo store"""
+    migrated = 0
+    async for equipment in db.equipments.find(
+        {"termo_responsabilidade": {"$type": "string"}},
+        {"_id": 0, "id": 1, "numero_patrimonio": 1, "termo_responsabilidade": 1}
+    ):
+        content = base64.b64decode(equipment["termo_responsabilidade"])
+        file_id, size = await termo_store.save(
+            f"termo_{equipment['numero_patrimonio']}.pdf", bytes_chunks(content)
+        )
+        # Every worker runs this at startup; only the first to swap the inline termo keeps its copy
+        result = await db.equipments.update_one(
+            {"id": equipment["id"], "termo_responsabilidade": {"$type": "string"}},
+            {
+                "$set": {"has_termo": True, "termo_file_id": file_id, "termo_size": size},
+                "$unset": {"termo_responsabilidade": ""}
+            }
+        )
+        if result.modified_count == 0:
+            await termo_store.delete(file_id)
+            continue
+        migrated += 1
+    if migrated:
+        logger.info(f"Migrated {migrated} inline termo(s) to {TERMO_STORAGE} storage")
+
+# Dashboard Counters
+STATS_ID = "dashboard"
+EQUIPMENT_BREAKDOWNS = {
+    "equipment_status": "status",
+    "equipment_tipo": "tipo_equipamento",
+    "equipment_departamento": "departamento_atual",
+}
+EQUIPMENT_STATS_PROJECTION = {"_id": 0, "id": 1, **{field: 1 for field in EQUIPMENT_BREAKDOWNS.values()}}
+EQUIPMENT_BULK_PROJECTION = {**EQUIPMENT_STATS_PROJECTION, "numero_patrimonio": 1, "responsavel_atual": 1, "termo_file_id": 1}
+
+def stat_key(value) -> str:
+    """Counter keys are data values, which may contain characters not allowed in field names"""
+    return str(value).replace(".", "\uff0e").replace("$", "\uff04")
+
+def stat_label(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def equipment_stats_delta(doc: dict, sign: int = 1) -> Counter:
+    delta = Counter({"equipments_total": sign})
+    for counter, field in EQUIPMENT_BREAKDOWNS.items():
+        delta[f"{counter}.{stat_key(doc.get(field))}"] += sign
+    return delta
+
+def equipment_status_delta(old_status: str, new_status: str, count: int = 1) -> Counter:
+    delta = Counter()
+    delta[f"equipment_status.{stat_key(old_status)}"] -= count
+    delta[f"equipment_status.{stat_key(new_status)}"] += count
+    return delta
+
+def loan_status_delta(old_status: Optional[str], new_status: str, count: int = 1) -> Counter:
+    delta = Counter()
+    if old_status:
+        delta[f"loan_status.{stat_key(old_status)}"] -= count
+    delta[f"loan_status.{stat_key(new_status)}"] += count
+    return delta
+
+async def apply_stats_delta(delta: Counter):
+    inc = {key: value for key, value in delta.items() if value}
+    if inc:
+        await db.stats.update_one(
+            {"_id": STATS_ID},
+            {"$inc": inc, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+
+async def rebuild_dashboard_stats() -> dict:
+    """Recount everything with one aggregation per collection and replace the counters document"""
+    facets = {
+        counter: [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}]
+        for counter, field in EQUIPMENT_BREAKDOWNS.items()
+    }
+    facets["equipments_total"] = [{"$count": "count"}]
+    [equipment_facets] = await db.equipments.aggregate([{"$facet": facets}]).to_list(1)
+    loan_groups = await db.loans.aggregate([
+        {"$group": {"_id": "$status_devolucao", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    
+    now = datetime.now(timezone.utc).isoformat()
+    stats = {
+        "equipments_total": equipment_facets["equipments_total"][0]["count"] if equipment_facets["equipments_total"] else 0,
+        **{
+            counter: {stat_key(group["_id"]): group["count"] for group in equipment_facets[counter]}
+            for counter in EQUIPMENT_BREAKDOWNS
+        },
+        "loan_status": {stat_key(group["_id"]): group["count"] for group in loan_groups},
+        "rebuilt_at": now,
+        "updated_at": now
+    }
+    await db.stats.replace_one({"_id": STATS_ID}, stats, upsert=True)
+    return stats
+
+async def ensure_dashboard_stats():
+    """Build the counters only when they were never built; replacing them on every worker start
+    would overwrite $inc writes from other workers landing between the aggregation and the replace"""
+    if await db.stats.find_one({"_id": STATS_ID, "rebuilt_at": {"$exists": True}}, {"_id": 1}) is None:
+        await rebuild_dashboard_stats()
+
+# Indexes
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "equipments": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("numero_patrimonio", ASCENDING)], name="numero_patrimonio_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+        IndexModel([("tipo_equipamento", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="tipo_created_at_id"),
+        IndexModel([("departamento_atual", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="departamento_created_at_id"),
+        IndexModel([("search_grams", ASCENDING)], name="search_grams"),
+        IndexModel([("search_words", ASCENDING)], name="search_words"),
+    ],
+    "loans": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("status_devolucao", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+        IndexModel([("status_devolucao", ASCENDING), ("data_prevista_devolucao_dt", ASCENDING)], name="status_data_prevista_dt"),
+        IndexModel([("data_emprestimo_dt", ASCENDING)], name="data_emprestimo_dt"),
+        IndexModel([("overdue_sweep", ASCENDING)], name="overdue_sweep", sparse=True),
+        IndexModel([("search_grams", ASCENDING)], name="search_grams"),
+        IndexModel([("search_words", ASCENDING)], name="search_words"),
+    ],
+    "equipment_history": [
+        IndexModel([("equipment_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="equipment_timestamp_id"),
+        IndexModel([("user", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="user_timestamp_id"),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id"),
+    ],
+    "equipment_history_archive": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("equipment_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="equipment_timestamp_id"),
+        IndexModel([("user", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="user_timestamp_id"),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id"),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+        IndexModel([("id", ASCENDING), ("user_id", ASCENDING)], name="id_user"),
+        IndexModel([("user_id", ASCENDING), ("read", ASCENDING), ("created_at", DESCENDING)], name="user_read_created_at"),
+        *([IndexModel(
+            [("read_at", ASCENDING)], name="read_at_ttl", expireAfterSeconds=NOTIFICATION_READ_TTL_DAYS * 86400
+        )] if NOTIFICATION_READ_TTL_DAYS > 0 else []),
+    ],
+    "import_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+}
+
+async def ensure_indexes():
+    """Create the declared indexes; existing ones are left untouched apart from their TTL"""
+    for collection_name, models in INDEXES.items():
+        for model in models:
+            # One index per call, so a conflicting index (e.g. duplicate patrimônios) doesn't block the rest
+            try:
+                await db[collection_name].create_indexes([model])
+            except OperationFailure as e:
+                # A changed TTL (e.g. NOTIFICATION_READ_TTL_DAYS) conflicts with the existing index's options;
+                # collMod applies the new expiry in place instead of requiring a drop and rebuild
+                if e.code == 85 and "expireAfterSeconds" in model.document:
+                    await update_index_expiry(collection_name, model.document)
+                else:
+                    logger.error(f"Could not create index {collection_name}.{model.document['name']}: {e}")
+
+async def update_index_expiry(collection_name: str, index: dict):
+    try:
+        await db.command({"collMod": collection_name, "index": {
+            "name": index["name"], "expireAfterSeconds": index["expireAfterSeconds"]
+        }})
+        logger.info(f"Updated {collection_name}.{index['name']} to expire after {index['expireAfterSeconds']}s")
+    except OperationFailure as e:
+        logger.error(f"Could not update expiry of index {collection_name}.{index['name']}: {e}")
+
+# Canonical query of each route: (route, collection, filter, sort)
+CANONICAL_QUERIES = [
+    ("GET /api/auth/me", "users", {"id": ""}, None),
+    ("POST /api/auth/login", "users", {"username": ""}, None),
+    ("GET /api/equipments", "equipments", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/equipments?status", "equipments", {"status": "Disponível"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/equipments?tipo", "equipments", {"tipo_equipamento": ""}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/equipments?departamento", "equipments", {"departamento_atual": ""}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/equipments?search", "equipments", {"search_grams": {"$all": ["del", "ell"]}}, None),
+    ("GET /api/equipments/{id}", "equipments", {"id": ""}, None),
+    ("POST /api/equipments", "equipments", {"numero_patrimonio": ""}, None),
+    ("GET /api/equipments/{id}/history", "equipment_history", {"equipment_id": ""}, [("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/history?user", "equipment_history", {"user": ""}, [("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/history", "equipment_history", {}, [("timestamp", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/loans", "loans", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/loans?status_devolucao", "loans", {"status_devolucao": "Pendente"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("GET /api/loans?search", "loans", {"search_grams": {"$all": ["sil", "ilv"]}}, None),
+    ("GET /api/loans/{id}", "loans", {"id": ""}, None),
+    ("GET /api/notifications", "notifications", {"user_id": ""}, [("created_at", DESCENDING)]),
+    ("PUT /api/notifications/{id}/read", "notifications", {"id": "", "user_id": ""}, None),
+    ("GET /api/notifications/unread-count", "notifications", {"user_id": "", "read": False}, None),
+    ("overdue sweeper", "loans", {"status_devolucao": "Pendente", "data_prevista_devolucao_dt": {"$lt": datetime(2000, 1, 1)}}, None),
+    ("GET /api/public/equipments/available", "equipments", {"status": "Disponível"}, [("tipo_equipamento", ASCENDING), ("numero_patrimonio", ASCENDING)]),
+    ("GET /api/import/jobs/{id}", "import_jobs", {"id": ""}, None),
+]
+
+def plan_stages(plan) -> List[str]:
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in plan_stages(item)]
+    return []
+
+async def explain_canonical_queries() -> List[dict]:
+    results = []
+    for route, collection_name, query, sort in CANONICAL_QUERIES:
+        db_cursor = db[collection_name].find(query).limit(1)
+        if sort:
+            db_cursor = db_cursor.sort(sort)
+        explain = await db_cursor.explain()
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        results.append({
+            "route": route,
+            "collection": collection_name,
+            "filter": query,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
+        })
+    return results
+
+async def verify_query_plans():
+    try:
+        results = await explain_canonical_queries()
+    except Exception as e:
+        logger.warning(f"Query plan verification skipped: {e}")
+        return
+    for result in results:
+        if result["collscan"]:
+            logger.warning(f"COLLSCAN plan for {result['route']} on {result['collection']}")
+
+# Loan Dates
+def parse_datetime(value: str) -> datetime:
+    """Parse an ISO date or datetime; values without an offset are taken as UTC"""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+# Loan dates are stored as ISO strings for the API and mirrored as BSON dates for queries and reports
+LOAN_DATE_FIELDS = {
+    "data_emprestimo": "Data de empréstimo inválida",
+    "data_prevista_devolucao": "Data prevista de devolução inválida",
+    "data_devolucao_real": "Data de devolução inválida",
+}
+
+def loan_date_fields(loan_doc: dict) -> dict:
+    fields = {}
+    for field, error in LOAN_DATE_FIELDS.items():
+        if loan_doc.get(field) is None:
+            continue
+        try:
+            fields[f"{field}_dt"] = parse_datetime(loan_doc[field])
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail=error)
+    return fields
+
+async def backfill_loan_dates():
+    updates = []
+    async for loan in db.loans.find(
+        {"$or": [
+            {"data_emprestimo_dt": {"$exists": False}},
+            {"data_prevista_devolucao_dt": {"$exists": False}},
+            {"data_devolucao_real": {"$ne": None}, "data_devolucao_real_dt": {"$exists": False}}
+        ]},
+        {"_id": 0, "id": 1, **{field: 1 for field in LOAN_DATE_FIELDS}}
+    ):
+        try:
+            updates.append(UpdateOne({"id": loan["id"]}, {"$set": loan_date_fields(loan)}))
+        except HTTPException as e:
+            logger.warning(f"Loan {loan['id']}: {e.detail}")
+        if len(updates) == BULK_WRITE_BATCH_SIZE:
+            await db.loans.bulk_write(updates, ordered=False)
+            updates = []
+    if updates:
+        await db.loans.bulk_write(updates, ordered=False)
+
+# Background Scheduler
+scheduler_tasks = []
+
+async def acquire_lock(name: str, ttl_seconds: int) -> bool:
+    """Take or renew a lease in the locks collection; only one worker holds a given lock at a time"""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.locks.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": WORKER_ID}]},
+            {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # Another worker holds an unexpired lease, so the upsert collided with its document
+        return False
+
+async def run_periodic(name: str, interval_seconds: int, job):
+    while True:
+        try:
+            if await acquire_lock(name, interval_seconds * 2):
+                await job()
+        except Exception:
+            logger.exception(f"Scheduled job {name} failed")
+        await asyncio.sleep(interval_seconds)
+
+def start_scheduler():
+    if not SCHEDULER_ENABLED:
+        return
+    scheduler_tasks.append(asyncio.create_task(
+        run_periodic("overdue_sweeper", OVERDUE_SWEEP_INTERVAL_SECONDS, sweep_overdue_loans)
+    ))
+    if HISTORY_RETENTION_DAYS > 0:
+        scheduler_tasks.append(asyncio.create_task(
+            run_periodic("history_archiver", HISTORY_ARCHIVE_INTERVAL_SECONDS, archive_history)
+        ))
+
+async def stop_scheduler():
+    for task in scheduler_tasks:
+        task.cancel()
+    await asyncio.gather(*scheduler_tasks, return_exceptions=True)
+    scheduler_tasks.clear()
+
+async def sweep_overdue_loans() -> int:
+    """Flip pending loans past their due date to Atrasado and notify the admins"""
+    sweep_id = str(uuid.uuid4())
+    result = await db.loans.update_many(
+        {"status_devolucao": "Pendente", "data_prevista_devolucao_dt": {"$lt": datetime.now(timezone.utc)}},
+        {"$set": {"status_devolucao": "Atrasado", "overdue_sweep": sweep_id}}
+    )
+    if not result.modified_count:
+        return 0
+    await apply_stats_delta(loan_status_delta("Pendente", "Atrasado", result.modified_count))
+    
+    overdue = await db.loans.find(
+        {"overdue_sweep": sweep_id},
+        {"_id": 0, "nome_solicitante": 1, "equipments": 1}
+    ).to_list(None)
+    admin_users = await db.users.find({"role": "admin"}, {"_id": 0, "id": 1}).to_list(None)
+    await create_notifications([
+        Notification(
+            user_id=admin["id"],
+            message=f"Empréstimo atrasado: {loan['nome_solicitante']} - {len(loan['equipments'])} equipamento(s)",
+            type="loan_overdue"
+        )
+        for loan in overdue
+        for admin in admin_users
+    ])
+    
+    logger.info(f"Marked {result.modified_count} loan(s) as overdue")
+    return result.modified_count
+
+# History Archival
+class HistoryArchive(ABC):
+    """Cold storage for equipment_history entries older than the retention window"""
+
+    @abstractmethod
+    async def save(self, entries: List[dict]):
+        """Store a batch; saving a batch again after an interrupted run must not duplicate it"""
+
+    @abstractmethod
+    async def find(self, query: dict, limit: int) -> List[dict]:
+        """Return up to limit entries matching query, newest first by (timestamp, id)"""
+
+    @abstractmethod
+    async def delete(self, equipment_ids: List[str]):
+        """Drop the archived entries of deleted equipments"""
+
+class CollectionHistoryArchive(HistoryArchive):
+    async def save(self, entries: List[dict]):
+        try:
+            await db.equipment_history_archive.insert_many([dict(entry) for entry in entries], ordered=False)
+        except BulkWriteError as e:
+            # Entries already archived by an interrupted run are skipped via the unique id index
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    async def find(self, query: dict, limit: int) -> List[dict]:
+        return await secondary_reads(db.equipment_history_archive).find(query, {"_id": 0}).sort(
+            [("timestamp", -1), ("id", -1)]
+        ).limit(limit).to_list(limit)
+
+    async def delete(self, equipment_ids: List[str]):
+        await db.equipment_history_archive.delete_many({"equipment_id": {"$in": equipment_ids}})
+
+ARCHIVE_COMPARISONS = {
+    "$gte": lambda value, bound: value >= bound,
+    "$lt": lambda value, bound: value < bound,
+    "$lte": lambda value, bound: value <= bound,
+}
+
+def entry_matches(entry: dict, query: dict) -> bool:
+    """Evaluate the subset of query operators used by history queries against a plain dict"""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(entry_matches(entry, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(entry_matches(entry, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = entry.get(key)
+            if value is None or not all(ARCHIVE_COMPARISONS[op](value, bound) for op, bound in condition.items()):
+                return False
+        elif entry.get(key) != condition:
+            return False
+    return True
+
+def archive_key(timestamp: str) -> str:
+    """Fixed-width UTC form of a timestamp, which sorts and compares as a string"""
+    return datetime.fromisoformat(timestamp).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+
+def timestamp_bounds(query: dict) -> tuple:
+    """(lowest, highest) timestamp a history query can match, None where unbounded"""
+    low, high = None, None
+    for key, condition in query.items():
+        if key in ("$and", "$or"):
+            bounds = [timestamp_bounds(sub) for sub in condition]
+            if key == "$and":
+                lows = [b[0] for b in bounds if b[0] is not None]
+                highs = [b[1] for b in bounds if b[1] is not None]
+                sub_low, sub_high = (max(lows) if lows else None), (min(highs) if highs else None)
+            else:
+                lows, highs = [b[0] for b in bounds], [b[1] for b in bounds]
+                sub_low = None if None in lows else min(lows)
+                sub_high = None if None in highs else max(highs)
+        elif key == "timestamp":
+            if isinstance(condition, dict):
+                sub_low = condition.get("$gte")
+                sub_high = condition.get("$lt") or condition.get("$lte")
+            else:
+                sub_low = sub_high = condition
+        else:
+            continue
+        if sub_low is not None and (low is None or sub_low > low):
+            low = sub_low
+        if sub_high is not None and (high is None or sub_high < high):
+            high = sub_high
+    return low, high
+
+class FileHistoryArchive(HistoryArchive):
+    """One gzipped NDJSON file per archived batch, named by the batch's timestamp range"""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _files(self) -> List[tuple]:
+        """(first key, last key, path) of every archive file, newest first"""
+        files = []
+        for path in self.root.glob("equipment_history-*.ndjson.gz"):
+            parts = path.name[:-len(".ndjson.gz")].split("-")
+            if len(parts) == 4:
+                files.append((parts[1], parts[2], path))
+        return sorted(files, key=lambda file: file[1], reverse=True)
+
+    def _write(self, entries: List[dict]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        first, last = entries[0], entries[-1]
+        digest = hashlib.sha1(f"{first['id']}|{last['id']}|{len(entries)}".encode('utf-8')).hexdigest()[:12]
+        path = self.root / f"equipment_history-{archive_key(first['timestamp'])}-{archive_key(last['timestamp'])}-{digest}.ndjson.gz"
+        # A run interrupted between archiving and deleting archives the same batch again; it is already here
+        if path.exists():
+            return
+        tmp_path = path.with_suffix(".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+        tmp_path.replace(path)
+
+    @staticmethod
+    def _bound_key(bound) -> Optional[str]:
+        # Bounds come from user filters and cursors; an unparseable one just doesn't prune
+        try:
+            return archive_key(bound) if isinstance(bound, str) else None
+        except ValueError:
+            return None
+
+    def _scan(self, query: dict, limit: int) -> List[dict]:
+        low_key, high_key = (self._bound_key(bound) for bound in timestamp_bounds(query))
+        matches = {}
+        for first_key, last_key, path in self._files():
+            if (high_key and first_key > high_key) or (low_key and last_key < low_key):
+                continue
+            if len(matches) >= limit:
+                # Files come newest first, so once a file ends before the current page it cannot contribute
+                oldest_kept = heapq.nlargest(limit, matches.values(), key=lambda entry: (entry["timestamp"], entry["id"]))[-1]
+                if last_key < archive_key(oldest_kept["timestamp"]):
+                    break
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                # Keyed by id, in case a batch was archived twice under different ranges
+                matches.update((entry["id"], entry) for entry in map(json.loads, f) if entry_matches(entry, query))
+        return heapq.nlargest(limit, matches.values(), key=lambda entry: (entry["timestamp"], entry["id"]))
+
+    def _purge(self, equipment_ids: set):
+        for _, _, path in self._files():
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                lines = f.readlines()
+            kept = [line for line in lines if json.loads(line)["equipment_id"] not in equipment_ids]
+            if len(kept) == len(lines):
+                continue
+            if not kept:
+                path.unlink()
+                continue
+            # Rewrite next to the original and swap, so readers never see a partial file
+            tmp_path = path.with_suffix(".tmp")
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                f.writelines(kept)
+            tmp_path.replace(path)
+
+    async def save(self, entries: List[dict]):
+        await run_in_threadpool(self._write, [{k: v for k, v in entry.items() if k != "_id"} for entry in entries])
+
+    async def find(self, query: dict, limit: int) -> List[dict]:
+        return await run_in_threadpool(self._scan, query, limit)
+
+    async def delete(self, equipment_ids: List[str]):
+        await run_in_threadpool(self._purge, set(equipment_ids))
+
+def get_history_archive() -> HistoryArchive:
+    if HISTORY_ARCHIVE == "file":
+        return FileHistoryArchive(HISTORY_ARCHIVE_PATH)
+    if HISTORY_ARCHIVE == "collection":
+        return CollectionHistoryArchive()
+    raise RuntimeError(f"HISTORY_ARCHIVE desconhecido: {HISTORY_ARCHIVE}")
+
+history_archive = get_history_archive()
+
+async def archive_history() -> int:
+    """Move history entries older than the retention window to the archive, batch by batch"""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=HISTORY_RETENTION_DAYS)).isoformat()
+    archived = 0
+    while True:
+        batch = await db.equipment_history.find({"timestamp": {"$lt": cutoff}}, {"_id": 0}).sort(
+            [("timestamp", 1), ("id", 1)]
+        ).limit(BULK_WRITE_BATCH_SIZE).to_list(BULK_WRITE_BATCH_SIZE)
+        if not batch:
+            break
+        # Archive first, then delete, so an interrupted run never loses entries. The batch is
+        # everything up to its last (timestamp, id), so that range (covered by timestamp_id) deletes it
+        await history_archive.save(batch)
+        last = batch[-1]
+        await db.equipment_history.delete_many({"$or": [
+            {"timestamp": {"$lt": last["timestamp"]}},
+            {"timestamp": last["timestamp"], "id": {"$lte": last["id"]}}
+        ]})
+        archived += len(batch)
+    if archived:
+        logger.info(f"Archived {archived} history entries older than {cutoff}")
+    return archived
+
+async def backfill_model_defaults():
+    """Set defaulted fields missing from documents written before the field existed (e.g. version)"""
+    for collection_name, model in (("equipments", Equipment), ("loans", Loan)):
+        for field, default in model_defaults(model).items():
+            result = await db[collection_name].update_many({field: {"$exists": False}}, {"$set": {field: default}})
+            if result.modified_count:
+                logger.info(f"Backfilled {collection_name}.{field} on {result.modified_count} documents")
+
+async def backfill_notification_read_at():
+    """Give notifications read before the TTL existed a read_at, so they expire too"""
+    if NOTIFICATION_READ_TTL_DAYS > 0:
+        await db.notifications.update_many(
+            {"read": True, "read_at": {"$exists": False}},
+            {"$set": {"read_at": datetime.now(timezone.utc)}}
+        )
+
 # Initialize default admin user
 async def init_db():
     existing_user = await db.users.find_one({"username": "dedianit"})
     if not existing_user:
-        hashed_password = bcrypt.hashpw("diadema123".encode('utf-8'), bcrypt.gensalt())
         user = {
             "id": str(uuid.uuid4()),
             "username": "dedianit",
-            "password": hashed_password.decode('utf-8'),
+            "password": await hash_password("diadema123"),
             "role": "admin"
         }
         await db.users.insert_one(user)
@@ -185,12 +1647,16 @@ async def init_db():
 
 # Auth Routes
 @api_router.post("/auth/login", response_model=TokenResponse)
-async def login(user_login: UserLogin):
-    user = await db.users.find_one({"username": user_login.username}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+async def login(user_login: UserLogin, request: Request):
+    # Checked before any bcrypt work so a credential-stuffing burst is rejected cheaply. Every attempt
+    # costs an IP token; the username bucket (shared by everyone using that account) only pays for failures.
+    username_key = user_login.username.lower()
+    login_ip_limiter.check(client_ip(request))
+    login_username_limiter.check(username_key, take=False)
     
-    if not bcrypt.checkpw(user_login.password.encode('utf-8'), user["password"].encode('utf-8')):
+    user = await db.users.find_one({"username": user_login.username}, {"_id": 0})
+    if not user or not await verify_password(user_login.password, user["password"]):
+        login_username_limiter.acquire(username_key)
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     access_token = create_access_token(data={"sub": user["id"]})
@@ -212,13 +1678,20 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 # Equipment Routes
 @api_router.post("/equipments", response_model=Equipment)
 async def create_equipment(equipment: EquipmentCreate, current_user: dict = Depends(get_current_user)):
-    # Check if patrimonio already exists
-    existing = await db.equipments.find_one({"numero_patrimonio": equipment.numero_patrimonio})
+    # Check if patrimonio already exists; the unique index can't be built over legacy duplicates
+    existing = await db.equipments.find_one({"numero_patrimonio": equipment.numero_patrimonio}, {"_id": 1})
     if existing:
         raise HTTPException(status_code=400, detail="Número de patrimônio já existe")
     
     equipment_obj = Equipment(**equipment.model_dump())
-    await db.equipments.insert_one(equipment_obj.model_dump())
+    equipment_doc = equipment_obj.model_dump()
+    # Where the unique index exists it also rejects a concurrent create that passed the check above
+    try:
+        await db.equipments.insert_one({**equipment_doc, **search_fields(equipment_doc, SEARCH_FIELDS["equipments"])})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Número de patrimônio já existe")
+    await apply_stats_delta(equipment_stats_delta(equipment_doc))
+    public_catalog.invalidate()
     
     await create_history_entry(
         equipment_obj.id,
@@ -229,14 +1702,12 @@ async def create_equipment(equipment: EquipmentCreate, current_user: dict = Depe
     
     return equipment_obj
 
-@api_router.get("/equipments", response_model=List[Equipment])
-async def get_equipments(
+def build_equipment_query(
     tipo: Optional[str] = None,
     departamento: Optional[str] = None,
     status: Optional[str] = None,
-    search: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
-):
+    search: Optional[str] = None
+) -> dict:
     query = {}
     if tipo:
         query["tipo_equipamento"] = tipo
@@ -244,47 +1715,116 @@ async def get_equipments(
         query["departamento_atual"] = departamento
     if status:
         query["status"] = status
-    if search:
-        query["$or"] = [
-            {"numero_patrimonio": {"$regex": search, "$options": "i"}},
-            {"numero_serie": {"$regex": search, "$options": "i"}},
-            {"marca": {"$regex": search, "$options": "i"}},
-            {"modelo": {"$regex": search, "$options": "i"}}
-        ]
-    
-    equipments = await db.equipments.find(query, {"_id": 0}).to_list(1000)
-    return equipments
+    search_filter = build_search_filter(search) if search else None
+    if search_filter:
+        query.update(search_filter)
+    return query
 
-@api_router.get("/equipments/{equipment_id}", response_model=Equipment)
-async def get_equipment(equipment_id: str, current_user: dict = Depends(get_current_user)):
-    equipment = await db.equipments.find_one({"id": equipment_id}, {"_id": 0})
-    if not equipment:
-        raise HTTPException(status_code=404, detail="Equipamento não encontrado")
+@api_router.get("/equipments", response_model=EquipmentPage)
+async def get_equipments(
+    tipo: Optional[str] = None,
+    departamento: Optional[str] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    query = build_equipment_query(tipo, departamento, status, search)
+    if stream:
+        return stream_ndjson(db.equipments, query, EQUIPMENT_LIST_PROJECTION, cursor)
+    if search and fold_text(search):
+        return ORJSONResponse(await fetch_search_page(db.equipments, query, search, EQUIPMENT_LIST_PROJECTION, limit, cursor))
+    return ORJSONResponse(await fetch_page(db.equipments, query, EQUIPMENT_LIST_PROJECTION, limit, cursor))
+
+def equipment_etag(version: Optional[int]) -> str:
+    return f'"{version or 0}"'
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Version an If-Match header expects; None when absent or a wildcard"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    try:
+        return int(if_match.strip().removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match inválido")
+
+def describe_changes(changes: dict) -> str:
+    return "Equipamento atualizado: " + "; ".join(
+        f"{field}: {change['from'] or '-'} → {change['to'] or '-'}" for field, change in changes.items()
+    )
+
+@api_router.get("/equipments/{equipment_id}", response_model=Equipment)
+async def get_equipment(equipment_id: str, response: Response, current_user: dict = Depends(get_current_user)):
+    equipment = await db.equipments.find_one({"id": equipment_id}, EQUIPMENT_PROJECTION)
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipamento não encontrado")
+    response.headers["ETag"] = equipment_etag(equipment.get("version"))
     return equipment
 
 @api_router.put("/equipments/{equipment_id}", response_model=Equipment)
 async def update_equipment(
     equipment_id: str,
     equipment_update: EquipmentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, alias="If-Match"),
     current_user: dict = Depends(get_current_user)
 ):
-    equipment = await db.equipments.find_one({"id": equipment_id})
-    if not equipment:
-        raise HTTPException(status_code=404, detail="Equipamento não encontrado")
-    
+    expected_version = parse_if_match(if_match)
     update_data = {k: v for k, v in equipment_update.model_dump().items() if v is not None}
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    await db.equipments.update_one({"id": equipment_id}, {"$set": update_data})
-    
-    await create_history_entry(
-        equipment_id,
-        "updated",
-        f"Equipamento atualizado",
-        current_user["username"]
+    query = {"id": equipment_id}
+    if expected_version is not None:
+        # Documents written before versioning have no counter and count as version 0
+        query["version"] = {"$in": [0, None]} if expected_version == 0 else expected_version
+    # The pre-image gives the field-level diff, and the post-image follows from it and the $set
+    equipment = await db.equipments.find_one_and_update(
+        query,
+        {"$set": update_data, "$inc": {"version": 1}},
+        projection=EQUIPMENT_PROJECTION,
+        return_document=ReturnDocument.BEFORE
     )
+    if equipment is None:
+        current = await db.equipments.find_one({"id": equipment_id}, {"_id": 0, "version": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail="Equipamento não encontrado")
+        raise HTTPException(
+            status_code=409,
+            detail="Equipamento alterado por outro usuário. Recarregue e tente novamente",
+            headers={"ETag": equipment_etag(current.get("version"))}
+        )
+    updated_equipment = {**equipment, **update_data, "version": equipment.get("version", 0) + 1}
+    public_catalog.invalidate()
+    
+    changes = {
+        field: {"from": equipment.get(field), "to": value}
+        for field, value in update_data.items()
+        if field != "updated_at" and equipment.get(field) != value
+    }
+    if any(field in changes for field in SEARCH_FIELDS["equipments"]):
+        # Guarded by the source values rather than the version: loans, returns and bulk writes bump the
+        # version without touching these fields, while an edit that changes them recomputes the tokens itself
+        await db.equipments.update_one(
+            {"id": equipment_id, **{field: updated_equipment.get(field) for field in SEARCH_FIELDS["equipments"]}},
+            {"$set": search_fields(updated_equipment, SEARCH_FIELDS["equipments"])}
+        )
+    if any(field in changes for field in EQUIPMENT_BREAKDOWNS.values()):
+        delta = equipment_stats_delta(equipment, -1)
+        delta.update(equipment_stats_delta(updated_equipment))
+        await apply_stats_delta(delta)
+    
+    if changes:
+        await create_history_entry(
+            equipment_id,
+            "updated",
+            describe_changes(changes),
+            current_user["username"],
+            changes
+        )
     
-    updated_equipment = await db.equipments.find_one({"id": equipment_id}, {"_id": 0})
+    response.headers["ETag"] = equipment_etag(updated_equipment["version"])
     return updated_equipment
 
 @api_router.delete("/equipments/{equipment_id}")
@@ -292,33 +1832,194 @@ async def delete_equipment(equipment_id: str, current_user: dict = Depends(get_c
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Apenas administradores podem deletar")
     
-    result = await db.equipments.delete_one({"id": equipment_id})
-    if result.deleted_count == 0:
+    deleted = await db.equipments.find_one_and_delete({"id": equipment_id}, projection=EQUIPMENT_BULK_PROJECTION)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Equipamento não encontrado")
+    await apply_stats_delta(equipment_stats_delta(deleted, -1))
+    public_catalog.invalidate()
+    await delete_equipment_assets([deleted])
     
     return {"message": "Equipamento deletado com sucesso"}
 
+async def delete_equipment_assets(equipments: List[dict]):
+    """Remove the history and termo files left behind by deleted equipments"""
+    equipment_ids = [equipment["id"] for equipment in equipments]
+    for offset in range(0, len(equipment_ids), BULK_WRITE_BATCH_SIZE):
+        batch = equipment_ids[offset:offset + BULK_WRITE_BATCH_SIZE]
+        await db.equipment_history.delete_many({"equipment_id": {"$in": batch}})
+        await history_archive.delete(batch)
+    for equipment in equipments:
+        if equipment.get("termo_file_id"):
+            await termo_store.delete(equipment["termo_file_id"])
+
+async def apply_bulk_write(operation: str, ids: List[str], changes: dict) -> set:
+    """Apply the operation to ids batch by batch and return the ids it actually reached"""
+    # Loans own the Emprestado status, so status changes and deletes skip equipments lent meanwhile
+    guard = {} if operation == "transfer" else {"status": {"$ne": "Emprestado"}}
+    applied = set()
+    for offset in range(0, len(ids), BULK_WRITE_BATCH_SIZE):
+        batch = ids[offset:offset + BULK_WRITE_BATCH_SIZE]
+        batch_query = {"id": {"$in": batch}, **guard}
+        if operation == "delete":
+            count = (await db.equipments.delete_many(batch_query)).deleted_count
+        else:
+            count = (await db.equipments.update_many(
+                batch_query, {"$set": changes, "$inc": {"version": 1}}
+            )).matched_count
+        if count == len(batch):
+            applied.update(batch)
+        elif operation == "delete":
+            applied.update(set(batch) - set(await db.equipments.distinct("id", {"id": {"$in": batch}})))
+        else:
+            # updated_at is unique to this operation, so it tells which documents the update reached
+            applied.update(await db.equipments.distinct(
+                "id", {"id": {"$in": batch}, "updated_at": changes["updated_at"]}
+            ))
+    return applied
+
+@api_router.post("/equipments/bulk", response_model=EquipmentBulkResult)
+async def bulk_equipments(bulk: EquipmentBulkRequest, current_user: dict = Depends(get_current_user)):
+    """Change the status of, transfer or delete many equipments with one write per batch"""
+    if bulk.operation == "delete" and current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Apenas administradores podem deletar")
+    if (bulk.ids is None) == (bulk.filter is None):
+        raise HTTPException(status_code=400, detail="Informe ids ou filtro")
+    
+    now = datetime.now(timezone.utc).isoformat()
+    if bulk.operation == "status":
+        if not bulk.status:
+            raise HTTPException(status_code=400, detail="Informe o novo status")
+        if bulk.status not in EQUIPMENT_STATUSES:
+            raise HTTPException(status_code=400, detail=f"Status inválido: {bulk.status}")
+        if bulk.status == "Emprestado":
+            raise HTTPException(status_code=400, detail="Use os empréstimos para emprestar equipamentos")
+        changes = {"status": bulk.status, "updated_at": now}
+    elif bulk.operation == "transfer":
+        if not bulk.departamento_atual:
+            raise HTTPException(status_code=400, detail="Informe o departamento de destino")
+        changes = {"departamento_atual": bulk.departamento_atual, "updated_at": now}
+        if bulk.responsavel_atual is not None:
+            changes["responsavel_atual"] = bulk.responsavel_atual
+    else:
+        changes = {}
+    
+    if bulk.ids is not None:
+        requested_ids = list(dict.fromkeys(bulk.ids))
+        if len(requested_ids) > BULK_OPERATION_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Máximo de {BULK_OPERATION_MAX_ITEMS} equipamentos por operação")
+        query = {"id": {"$in": requested_ids}}
+    else:
+        query = build_equipment_query(**bulk.filter.model_dump())
+        if not query:
+            raise HTTPException(status_code=400, detail="Filtro vazio")
+    
+    equipments = await db.equipments.find(query, EQUIPMENT_BULK_PROJECTION).to_list(BULK_OPERATION_MAX_ITEMS + 1)
+    if len(equipments) > BULK_OPERATION_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {BULK_OPERATION_MAX_ITEMS} equipamentos por operação")
+    
+    results = {}
+    targets = []
+    for equipment in equipments:
+        if bulk.operation != "transfer" and equipment.get("status") == "Emprestado":
+            results[equipment["id"]] = EquipmentBulkItemResult(
+                id=equipment["id"], numero_patrimonio=equipment["numero_patrimonio"],
+                ok=False, detail="Equipamento emprestado"
+            )
+        else:
+            targets.append(equipment)
+    
+    applied_ids = await apply_bulk_write(bulk.operation, [equipment["id"] for equipment in targets], changes)
+    applied = [equipment for equipment in targets if equipment["id"] in applied_ids]
+    for equipment in targets:
+        ok = equipment["id"] in applied_ids
+        results[equipment["id"]] = EquipmentBulkItemResult(
+            id=equipment["id"], numero_patrimonio=equipment["numero_patrimonio"],
+            ok=ok, detail=None if ok else "Equipamento alterado durante a operação"
+        )
+    
+    delta = Counter()
+    history = []
+    for equipment in applied:
+        delta.update(equipment_stats_delta(equipment, -1))
+        if bulk.operation == "delete":
+            continue
+        delta.update(equipment_stats_delta({**equipment, **changes}))
+        changed = {
+            field: {"from": equipment.get(field), "to": value}
+            for field, value in changes.items()
+            if field != "updated_at" and equipment.get(field) != value
+        }
+        if not changed:
+            continue
+        if "status" in changed:
+            description = f"Status alterado de {equipment.get('status')} para {bulk.status}"
+        elif "departamento_atual" in changed:
+            description = f"Transferido de {equipment.get('departamento_atual')} para {bulk.departamento_atual}"
+        else:
+            description = f"Responsável alterado de {equipment.get('responsavel_atual')} para {bulk.responsavel_atual}"
+        history.append(EquipmentHistory(
+            equipment_id=equipment["id"],
+            action="updated",
+            description=description,
+            user=current_user["username"],
+            changes=changed
+        ))
+    await apply_stats_delta(delta)
+    if applied:
+        public_catalog.invalidate()
+    if bulk.operation == "delete":
+        await delete_equipment_assets(applied)
+    else:
+        await create_history_entries(history)
+    
+    if bulk.ids is not None:
+        ordered = [
+            results.get(equipment_id) or EquipmentBulkItemResult(id=equipment_id, ok=False, detail="Equipamento não encontrado")
+            for equipment_id in requested_ids
+        ]
+    else:
+        ordered = [results[equipment["id"]] for equipment in equipments]
+    succeeded = sum(1 for result in ordered if result.ok)
+    return EquipmentBulkResult(
+        operation=bulk.operation,
+        matched=len(equipments),
+        succeeded=succeeded,
+        failed=len(ordered) - succeeded,
+        results=ordered
+    )
+
 @api_router.post("/equipments/{equipment_id}/upload-termo")
 async def upload_termo(
     equipment_id: str,
     file: UploadFile = File(...),
     current_user: dict = Depends(get_current_user)
 ):
-    equipment = await db.equipments.find_one({"id": equipment_id})
-    if not equipment:
+    equipment = await db.equipments.find_one({"id": equipment_id}, {"_id": 0, "termo_file_id": 1})
+    if equipment is None:
         raise HTTPException(status_code=404, detail="Equipamento não encontrado")
     
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Apenas arquivos PDF são permitidos")
     
-    content = await file.read()
-    base64_pdf = base64.b64encode(content).decode('utf-8')
+    file_id, size = await termo_store.save(file.filename or f"termo_{equipment_id}.pdf", upload_chunks(file))
     
     await db.equipments.update_one(
         {"id": equipment_id},
-        {"$set": {"termo_responsabilidade": base64_pdf, "updated_at": datetime.now(timezone.utc).isoformat()}}
+        {
+            "$set": {
+                "has_termo": True,
+                "termo_file_id": file_id,
+                "termo_size": size,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            },
+            "$unset": {"termo_responsabilidade": ""}
+        }
     )
     
+    # Replaced termos are removed only after the new file is referenced
+    if equipment.get("termo_file_id"):
+        await termo_store.delete(equipment["termo_file_id"])
+    
     await create_history_entry(
         equipment_id,
         "termo_uploaded",
@@ -328,118 +2029,273 @@ async def upload_termo(
     
     return {"message": "Termo anexado com sucesso"}
 
-@api_router.get("/equipments/{equipment_id}/history")
-async def get_equipment_history(equipment_id: str, current_user: dict = Depends(get_current_user)):
-    history = await db.equipment_history.find({"equipment_id": equipment_id}, {"_id": 0}).to_list(100)
-    return history
+@api_router.get("/equipments/{equipment_id}/termo")
+async def download_termo(
+    equipment_id: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    current_user: dict = Depends(get_current_user)
+):
+    equipment = await db.equipments.find_one(
+        {"id": equipment_id},
+        {"_id": 0, "numero_patrimonio": 1, "termo_file_id": 1, "termo_size": 1}
+    )
+    if not equipment:
+        raise HTTPException(status_code=404, detail="Equipamento não encontrado")
+    if not equipment.get("termo_file_id"):
+        raise HTTPException(status_code=404, detail="Termo não encontrado")
+    
+    size = equipment["termo_size"]
+    byte_range = parse_range(range_header, size) if size else None
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f"inline; filename=termo_{equipment['numero_patrimonio']}.pdf"
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    return StreamingResponse(
+        termo_store.read(equipment["termo_file_id"], start, end),
+        status_code=206 if byte_range else 200,
+        media_type="application/pdf",
+        headers=headers
+    )
+
+def build_history_query(
+    equipment_id: Optional[str] = None,
+    user: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+) -> dict:
+    query = {}
+    if equipment_id:
+        query["equipment_id"] = equipment_id
+    if user:
+        query["user"] = user
+    if action:
+        query["action"] = action
+    # Timestamps are stored as UTC isoformat strings, so normalized bounds compare correctly as strings
+    try:
+        if since:
+            query.setdefault("timestamp", {})["$gte"] = parse_datetime(since).astimezone(timezone.utc).isoformat()
+        if until:
+            end = parse_datetime(until).astimezone(timezone.utc)
+            if len(until) == 10:
+                # A bare date includes the whole day
+                query.setdefault("timestamp", {})["$lt"] = (end + timedelta(days=1)).isoformat()
+            else:
+                query.setdefault("timestamp", {})["$lte"] = end.isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida")
+    return query
+
+async def fetch_history_page(query: dict, limit: int, cursor: Optional[str], include_archived: bool) -> dict:
+    if not include_archived:
+        return await fetch_page(secondary_reads(db.equipment_history), query, {"_id": 0}, limit, cursor, "timestamp")
+    
+    query = apply_cursor(query, cursor, "timestamp")
+    hot = await secondary_reads(db.equipment_history).find(query, {"_id": 0}).sort(
+        [("timestamp", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    # Archived entries are all older than the hot ones, so the archive is only read once the hot side runs out
+    archived = await history_archive.find(query, limit + 1) if len(hot) <= limit else []
+    docs = heapq.nlargest(limit + 1, hot + archived, key=lambda entry: (entry["timestamp"], entry["id"]))
+    next_cursor = encode_cursor(docs[limit - 1], "timestamp") if len(docs) > limit else None
+    return {"items": docs[:limit], "next_cursor": next_cursor}
+
+@api_router.get("/equipments/{equipment_id}/history", response_model=EquipmentHistoryPage)
+async def get_equipment_history(
+    equipment_id: str,
+    action: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """Timeline of an equipment, newest first"""
+    query = build_history_query(equipment_id=equipment_id, action=action, since=since, until=until)
+    return await fetch_history_page(query, limit, cursor, include_archived)
+
+@api_router.get("/history", response_model=EquipmentHistoryPage)
+async def get_history_feed(
+    user: Optional[str] = None,
+    equipment_id: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    include_archived: bool = False,
+    current_user: dict = Depends(get_admin_user)
+):
+    """Audit feed across all equipments, newest first"""
+    query = build_history_query(equipment_id=equipment_id, user=user, action=action, since=since, until=until)
+    return await fetch_history_page(query, limit, cursor, include_archived)
 
 # Loan Routes
-@api_router.post("/loans", response_model=Loan)
-async def create_loan(loan: LoanCreate, current_user: dict = Depends(get_current_user)):
-    # Verify all equipments exist and are available
-    for patrimonio in loan.equipments:
-        equipment = await db.equipments.find_one({"numero_patrimonio": patrimonio})
-        if not equipment:
+async def lend_equipments(loan: LoanCreate, history_description: str, history_user: str) -> Loan:
+    """Validate, reserve and record a loan with a constant number of round-trips"""
+    patrimonios = list(dict.fromkeys(loan.equipments))
+    equipments = {
+        doc["numero_patrimonio"]: doc
+        async for doc in db.equipments.find(
+            {"numero_patrimonio": {"$in": patrimonios}},
+            {"_id": 0, "numero_patrimonio": 1, **EQUIPMENT_STATS_PROJECTION}
+        )
+    }
+    for patrimonio in patrimonios:
+        if patrimonio not in equipments:
             raise HTTPException(status_code=404, detail=f"Equipamento {patrimonio} não encontrado")
-        if equipment["status"] == "Emprestado":
+        if equipments[patrimonio]["status"] == "Emprestado":
             raise HTTPException(status_code=400, detail=f"Equipamento {patrimonio} já está emprestado")
     
-    loan_obj = Loan(**loan.model_dump())
-    await db.loans.insert_one(loan_obj.model_dump())
+    loan_obj = Loan(**{**loan.model_dump(), "equipments": patrimonios})
+    loan_doc = loan_obj.model_dump()
+    date_fields = loan_date_fields(loan_doc)
     
-    # Update equipment status
-    for patrimonio in loan.equipments:
-        await db.equipments.update_one(
-            {"numero_patrimonio": patrimonio},
-            {"$set": {"status": "Emprestado", "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
-        
-        equipment = await db.equipments.find_one({"numero_patrimonio": patrimonio})
-        await create_history_entry(
-            equipment["id"],
-            "loaned",
-            f"Emprestado para {loan.nome_solicitante}",
-            current_user["username"]
+    # The status precondition makes the reservation atomic per document, so concurrent
+    # requests for the same asset cannot both succeed
+    result = await db.equipments.update_many(
+        {"numero_patrimonio": {"$in": patrimonios}, "status": {"$ne": "Emprestado"}},
+        {
+            "$set": {
+                "status": "Emprestado",
+                "current_loan_id": loan_obj.id,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            },
+            "$inc": {"version": 1}
+        }
+    )
+    public_catalog.invalidate()
+    if result.modified_count < len(patrimonios):
+        for previous_status in {doc["status"] for doc in equipments.values()}:
+            await db.equipments.update_many(
+                {
+                    "current_loan_id": loan_obj.id,
+                    "numero_patrimonio": {"$in": [p for p, doc in equipments.items() if doc["status"] == previous_status]}
+                },
+                {"$set": {"status": previous_status}, "$unset": {"current_loan_id": ""}, "$inc": {"version": 1}}
+            )
+        raise HTTPException(status_code=409, detail="Um ou mais equipamentos acabaram de ser emprestados")
+    
+    await db.loans.insert_one({**loan_doc, **date_fields, **search_fields(loan_doc, SEARCH_FIELDS["loans"])})
+    
+    await create_history_entries([
+        EquipmentHistory(
+            equipment_id=equipments[patrimonio]["id"],
+            action="loaned",
+            description=history_description,
+            user=history_user
         )
+        for patrimonio in patrimonios
+    ])
+    
+    stats_delta = loan_status_delta(None, loan_obj.status_devolucao)
+    for doc in equipments.values():
+        stats_delta.update(equipment_status_delta(doc["status"], "Emprestado"))
+    await apply_stats_delta(stats_delta)
+    
+    return loan_obj
+
+@api_router.post("/loans", response_model=Loan)
+async def create_loan(loan: LoanCreate, current_user: dict = Depends(get_current_user)):
+    loan_obj = await lend_equipments(loan, f"Emprestado para {loan.nome_solicitante}", current_user["username"])
     
     # Create notification
     await create_notification(
         current_user["id"],
-        f"Empréstimo criado: {loan.nome_solicitante} - {len(loan.equipments)} equipamento(s)",
+        f"Empréstimo criado: {loan_obj.nome_solicitante} - {len(loan_obj.equipments)} equipamento(s)",
         "loan_created"
     )
     
     return loan_obj
 
-@api_router.get("/loans", response_model=List[Loan])
+def build_loan_query(status_devolucao: Optional[str] = None, search: Optional[str] = None) -> dict:
+    query = {}
+    if status_devolucao:
+        query["status_devolucao"] = status_devolucao
+    search_filter = build_search_filter(search) if search else None
+    if search_filter:
+        query.update(search_filter)
+    return query
+
+@api_router.get("/loans", response_model=LoanPage)
 async def get_loans(
     status_devolucao: Optional[str] = None,
     search: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    stream: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    query = {}
-    if status_devolucao:
-        query["status_devolucao"] = status_devolucao
-    if search:
-        query["$or"] = [
-            {"nome_solicitante": {"$regex": search, "$options": "i"}},
-            {"departamento_solicitante": {"$regex": search, "$options": "i"}}
-        ]
-    
-    loans = await db.loans.find(query, {"_id": 0}).to_list(1000)
-    
-    # Check for overdue loans
-    current_date = datetime.now(timezone.utc)
-    for loan in loans:
-        if loan["status_devolucao"] == "Pendente":
-            data_prevista = datetime.fromisoformat(loan["data_prevista_devolucao"])
-            if current_date > data_prevista:
-                await db.loans.update_one(
-                    {"id": loan["id"]},
-                    {"$set": {"status_devolucao": "Atrasado"}}
-                )
-                loan["status_devolucao"] = "Atrasado"
-    
-    return loans
+    query = build_loan_query(status_devolucao, search)
+    if stream:
+        return stream_ndjson(db.loans, query, LOAN_LIST_PROJECTION, cursor)
+    if search and fold_text(search):
+        return ORJSONResponse(await fetch_search_page(db.loans, query, search, LOAN_LIST_PROJECTION, limit, cursor))
+    return ORJSONResponse(await fetch_page(db.loans, query, LOAN_LIST_PROJECTION, limit, cursor))
 
 @api_router.get("/loans/{loan_id}", response_model=Loan)
 async def get_loan(loan_id: str, current_user: dict = Depends(get_current_user)):
-    loan = await db.loans.find_one({"id": loan_id}, {"_id": 0})
+    loan = await db.loans.find_one({"id": loan_id}, LOAN_PROJECTION)
     if not loan:
         raise HTTPException(status_code=404, detail="Empréstimo não encontrado")
     return loan
 
 @api_router.put("/loans/{loan_id}/return")
 async def return_loan(loan_id: str, loan_return: LoanReturn, current_user: dict = Depends(get_current_user)):
-    loan = await db.loans.find_one({"id": loan_id})
-    if not loan:
-        raise HTTPException(status_code=404, detail="Empréstimo não encontrado")
-    
-    if loan["status_devolucao"] == "Devolvido":
-        raise HTTPException(status_code=400, detail="Empréstimo já devolvido")
+    date_fields = loan_date_fields(loan_return.model_dump())
     
-    await db.loans.update_one(
-        {"id": loan_id},
+    # Claiming the loan atomically keeps concurrent returns from running twice
+    loan = await db.loans.find_one_and_update(
+        {"id": loan_id, "status_devolucao": {"$ne": "Devolvido"}},
         {"$set": {
             "data_devolucao_real": loan_return.data_devolucao_real,
-            "status_devolucao": "Devolvido"
-        }}
+            "status_devolucao": "Devolvido",
+            **date_fields
+        }},
+        projection={"_id": 0, "nome_solicitante": 1, "equipments": 1, "status_devolucao": 1},
+        return_document=ReturnDocument.BEFORE
     )
+    if loan is None:
+        if await db.loans.count_documents({"id": loan_id}, limit=1):
+            raise HTTPException(status_code=400, detail="Empréstimo já devolvido")
+        raise HTTPException(status_code=404, detail="Empréstimo não encontrado")
+    
+    equipments = await db.equipments.find(
+        {"numero_patrimonio": {"$in": loan["equipments"]}},
+        EQUIPMENT_STATS_PROJECTION
+    ).to_list(None)
     
     # Update equipment status back to available
-    for patrimonio in loan["equipments"]:
-        await db.equipments.update_one(
-            {"numero_patrimonio": patrimonio},
-            {"$set": {"status": "Disponível", "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
-        
-        equipment = await db.equipments.find_one({"numero_patrimonio": patrimonio})
-        await create_history_entry(
-            equipment["id"],
-            "returned",
-            f"Devolvido por {loan['nome_solicitante']}",
-            current_user["username"]
+    await db.equipments.update_many(
+        {"numero_patrimonio": {"$in": loan["equipments"]}},
+        {
+            "$set": {"status": "Disponível", "updated_at": datetime.now(timezone.utc).isoformat()},
+            "$unset": {"current_loan_id": ""},
+            "$inc": {"version": 1}
+        }
+    )
+    public_catalog.invalidate()
+    
+    await create_history_entries([
+        EquipmentHistory(
+            equipment_id=equipment["id"],
+            action="returned",
+            description=f"Devolvido por {loan['nome_solicitante']}",
+            user=current_user["username"]
         )
+        for equipment in equipments
+    ])
+    
+    stats_delta = loan_status_delta(loan["status_devolucao"], "Devolvido")
+    for equipment in equipments:
+        stats_delta.update(equipment_status_delta(equipment["status"], "Disponível"))
+    await apply_stats_delta(stats_delta)
     
     # Create notification
     await create_notification(
@@ -452,41 +2308,180 @@ async def return_loan(loan_id: str, loan_return: LoanReturn, current_user: dict
 
 # Notifications Routes
 @api_router.get("/notifications", response_model=List[Notification])
-async def get_notifications(current_user: dict = Depends(get_current_user)):
+async def get_notifications(unread: bool = False, current_user: dict = Depends(get_current_user)):
+    query = {"user_id": current_user["id"]}
+    if unread:
+        query["read"] = False
     notifications = await db.notifications.find(
-        {"user_id": current_user["id"]},
+        query,
         {"_id": 0}
     ).sort("created_at", -1).to_list(100)
     return notifications
 
+@api_router.get("/notifications/unread-count")
+async def get_unread_notification_count(current_user: dict = Depends(get_current_user)):
+    count = await db.notifications.count_documents({"user_id": current_user["id"], "read": False})
+    return {"unread": count}
+
+@api_router.post("/notifications/stream-token")
+async def get_stream_token(current_user: dict = Depends(get_current_user)):
+    """Short-lived token for /notifications/stream, so the access token never goes in a URL"""
+    return {"token": create_stream_token(current_user["id"]), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(request: Request, token: str):
+    """Server-sent events with each new notification; EventSource cannot set headers, so the stream token is a query param"""
+    current_user = await authenticate_token(token, scope=STREAM_TOKEN_SCOPE)
+    queue = notification_broker.subscribe(current_user["id"])
+    
+    async def generate():
+        try:
+            unread = await db.notifications.count_documents({"user_id": current_user["id"], "read": False})
+            yield f"event: unread\ndata: {json.dumps({'unread': unread})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    notification = await asyncio.wait_for(queue.get(), NOTIFICATION_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: notification\ndata: {json.dumps(notification, ensure_ascii=False)}\n\n"
+        finally:
+            notification_broker.unsubscribe(current_user["id"], queue)
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.put("/notifications/read")
+async def mark_notifications_read(request: NotificationReadRequest, current_user: dict = Depends(get_current_user)):
+    """Mark the given notification ids, or all of them when no ids are sent, as read"""
+    query = {"user_id": current_user["id"], "read": False}
+    if request.ids is not None:
+        query["id"] = {"$in": request.ids}
+    result = await db.notifications.update_many(query, {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}})
+    return {"message": "Notificações marcadas como lidas", "updated": result.modified_count}
+
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: dict = Depends(get_current_user)):
     await db.notifications.update_one(
         {"id": notification_id, "user_id": current_user["id"]},
-        {"$set": {"read": True}}
+        {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}}
     )
     return {"message": "Notificação marcada como lida"}
 
+# Spreadsheet Pool
+spreadsheet_executor = ThreadPoolExecutor(max_workers=SPREADSHEET_WORKERS, thread_name_prefix="spreadsheet")
+spreadsheet_slots = asyncio.Semaphore(SPREADSHEET_WORKERS + SPREADSHEET_QUEUE_SIZE)
+
+async def run_spreadsheet_task(func, *args, wait: bool = False):
+    """Run blocking pandas/openpyxl work on the spreadsheet pool, waiting for a queue slot.
+
+    Requests give up with 503 after SPREADSHEET_QUEUE_TIMEOUT_SECONDS; background jobs pass
+    wait=True, since failing between blocks would leave an import half committed.
+    """
+    try:
+        await asyncio.wait_for(spreadsheet_slots.acquire(), None if wait else SPREADSHEET_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Servidor ocupado processando planilhas. Tente novamente")
+    try:
+        return await asyncio.get_running_loop().run_in_executor(spreadsheet_executor, func, *args)
+    finally:
+        spreadsheet_slots.release()
+
 # Export Routes
-@api_router.get("/export/equipments")
-async def export_equipments(current_user: dict = Depends(get_current_user)):
-    equipments = await db.equipments.find({}, {"_id": 0}).to_list(1000)
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+EQUIPMENT_EXPORT_COLUMNS = [
+    "id", "numero_patrimonio", "numero_serie", "marca", "modelo", "tipo_equipamento",
+    "departamento_atual", "responsavel_atual", "has_termo", "status", "created_at", "updated_at"
+]
+LOAN_EXPORT_COLUMNS = [
+    "id", "data_emprestimo", "nome_solicitante", "departamento_solicitante", "data_prevista_devolucao",
+    "data_devolucao_real", "status_devolucao", "equipments", "created_at"
+]
+
+def export_cell(value):
+    if isinstance(value, list):
+        return ', '.join(str(item) for item in value)
+    return value
+
+async def iter_export_batches(collection, query: dict, columns: List[str]) -> AsyncIterator[list]:
+    """Read only the exported columns from the Motor cursor, yielding rows batch by batch"""
+    db_cursor = secondary_reads(collection).find(query, {"_id": 0, **{col: 1 for col in columns}}).batch_size(STREAM_BATCH_SIZE)
+    batch = []
+    async for doc in db_cursor:
+        batch.append([doc.get(col) for col in columns])
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def write_xlsx_rows(worksheet, rows: list):
+    for row in rows:
+        worksheet.append([export_cell(value) for value in row])
+
+async def export_response(collection, query: dict, columns: List[str], export_format: str, name: str, sheet_name: str):
+    filename = f"{name}.{export_format}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
     
-    df = pd.DataFrame(equipments)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Equipamentos')
-    output.seek(0)
+    if export_format == "csv":
+        async def generate_csv():
+            yield "\ufeff" + ",".join(columns) + "\r\n"
+            async for batch in iter_export_batches(collection, query, columns):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows([export_cell(value) for value in row] for row in batch)
+                yield buffer.getvalue()
+        return StreamingResponse(generate_csv(), media_type="text/csv; charset=utf-8", headers=headers)
+    
+    if export_format == "ndjson":
+        async def generate_ndjson():
+            async for batch in iter_export_batches(collection, query, columns):
+                yield "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in batch)
+        return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson", headers=headers)
     
+    # xlsx is a zip container, so rows are spooled to a temp file by openpyxl's write-only mode
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+    worksheet.append(columns)
+    async for batch in iter_export_batches(collection, query, columns):
+        await run_spreadsheet_task(write_xlsx_rows, worksheet, batch)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
+        path = tmp.name
+    remove_file = functools.partial(Path(path).unlink, missing_ok=True)
+    try:
+        await run_spreadsheet_task(workbook.save, path)
+    except BaseException:
+        remove_file()
+        raise
+    
+    async def generate_file():
+        try:
+            with open(path, "rb") as f:
+                while chunk := await run_in_threadpool(f.read, TERMO_CHUNK_SIZE):
+                    yield chunk
+        finally:
+            remove_file()
+    # The background task also covers a client that disconnects before the generator starts
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=equipamentos.xlsx"}
+        generate_file(), media_type=XLSX_MEDIA_TYPE, headers=headers, background=BackgroundTask(remove_file)
     )
 
-@api_router.get("/export/equipments/template")
-async def export_equipment_template(current_user: dict = Depends(get_current_user)):
-    """Export an Excel template for equipment import"""
+@api_router.get("/export/equipments")
+async def export_equipments(
+    tipo: Optional[str] = None,
+    departamento: Optional[str] = None,
+    status: Optional[str] = None,
+    search: Optional[str] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv|ndjson)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    query = build_equipment_query(tipo, departamento, status, search)
+    return await export_response(db.equipments, query, EQUIPMENT_EXPORT_COLUMNS, format, "equipamentos", "Equipamentos")
+
+@functools.lru_cache(maxsize=1)
+def build_equipment_template() -> bytes:
     template_data = {
         "numero_patrimonio": ["PAT-001", "PAT-002"],
         "numero_serie": ["SN123456", "SN789012"],
@@ -502,190 +2497,619 @@ async def export_equipment_template(current_user: dict = Depends(get_current_use
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
         df.to_excel(writer, index=False, sheet_name='Equipamentos')
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    return output.getvalue()
+
+@api_router.get("/export/equipments/template")
+async def export_equipment_template(current_user: dict = Depends(get_current_user)):
+    """Export an Excel template for equipment import"""
+    # The workbook never changes, so it is built once per worker and served from memory
+    content = await run_spreadsheet_task(build_equipment_template)
+    return Response(
+        content,
+        media_type=XLSX_MEDIA_TYPE,
         headers={"Content-Disposition": "attachment; filename=template_equipamentos.xlsx"}
     )
 
+# Import Pipeline
+IMPORT_REQUIRED_COLUMNS = [
+    "numero_patrimonio", "numero_serie", "marca", "modelo",
+    "tipo_equipamento", "departamento_atual", "status"
+]
+IMPORT_COLUMNS = IMPORT_REQUIRED_COLUMNS + ["responsavel_atual"]
+
+def with_sheet_lines(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop blank rows, indexing the rest by their line in the sheet (the header is line 1)"""
+    df = df.dropna(how="all")
+    df.index = df.index + 2
+    return df
+
+def read_import_file(filename: str, content: bytes) -> pd.DataFrame:
+    if filename.lower().endswith('.csv'):
+        # sep=None sniffs both "," (template) and ";" (Excel pt-BR) delimited files
+        df = pd.read_csv(
+            io.BytesIO(content), dtype=str, sep=None, engine="python", encoding="utf-8-sig", skip_blank_lines=False
+        )
+    else:
+        df = pd.read_excel(io.BytesIO(content), dtype=str)
+    df.columns = [str(col).strip() for col in df.columns]
+    return with_sheet_lines(df)
+
+def check_import_columns(columns):
+    missing_columns = [col for col in IMPORT_REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Colunas obrigatórias faltando: {', '.join(missing_columns)}"
+        )
+
+def validate_import_frame(df: pd.DataFrame, seen: set) -> tuple:
+    """Normalize and validate an import block (indexed by sheet line) column by column, returning (valid rows, errors by line)"""
+    df = df.reindex(columns=IMPORT_COLUMNS).fillna("").astype(str)
+    df = df.apply(lambda col: col.str.strip())
+    df["status"] = df["status"].mask(df["status"] == "", "Disponível")
+    
+    problems = pd.Series("", index=df.index)
+    for col in IMPORT_REQUIRED_COLUMNS:
+        problems = problems.mask((problems == "") & (df[col] == ""), f"Coluna {col} vazia")
+    problems = problems.mask(
+        (problems == "") & ~df["status"].isin(EQUIPMENT_STATUSES),
+        "Status inválido: " + df["status"]
+    )
+    duplicated = df["numero_patrimonio"].duplicated() | df["numero_patrimonio"].isin(seen)
+    problems = problems.mask(
+        (problems == "") & duplicated,
+        "Patrimônio " + df["numero_patrimonio"] + " duplicado na planilha"
+    )
+    seen.update(df["numero_patrimonio"])
+    
+    errors = {line: f"Linha {line}: {message}" for line, message in problems[problems != ""].items()}
+    return df[problems == ""], errors
+
+async def import_equipment_frame(df: pd.DataFrame, username: str, seen: set, background: bool = False) -> tuple:
+    """Validate and insert a block of spreadsheet rows, returning (success_count, errors by line)"""
+    valid, errors = await run_spreadsheet_task(validate_import_frame, df, seen, wait=background)
+    
+    existing = {
+        doc["numero_patrimonio"]
+        async for doc in db.equipments.find(
+            {"numero_patrimonio": {"$in": valid["numero_patrimonio"].tolist()}},
+            {"_id": 0, "numero_patrimonio": 1}
+        )
+    }
+    exists_mask = valid["numero_patrimonio"].isin(existing)
+    for line, patrimonio in valid.loc[exists_mask, "numero_patrimonio"].items():
+        errors[line] = f"Linha {line}: Patrimônio {patrimonio} já existe"
+    valid = valid[~exists_mask]
+    
+    lines = valid.index.tolist()
+    records = valid.to_dict("records")
+    for record in records:
+        record["responsavel_atual"] = record["responsavel_atual"] or None
+    success_count = 0
+    for offset in range(0, len(records), BULK_WRITE_BATCH_SIZE):
+        batch_lines = lines[offset:offset + BULK_WRITE_BATCH_SIZE]
+        docs = [Equipment(**record).model_dump() for record in records[offset:offset + BULK_WRITE_BATCH_SIZE]]
+        for doc in docs:
+            doc.update(search_fields(doc, SEARCH_FIELDS["equipments"]))
+        failed = {}
+        try:
+            await db.equipments.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err["errmsg"] for err in e.details["writeErrors"]}
+        for index, errmsg in failed.items():
+            line = batch_lines[index]
+            if errmsg.startswith("E11000"):
+                errors[line] = f"Linha {line}: Patrimônio {docs[index]['numero_patrimonio']} já existe"
+            else:
+                errors[line] = f"Linha {line}: {errmsg}"
+        
+        inserted = [doc for index, doc in enumerate(docs) if index not in failed]
+        if inserted:
+            public_catalog.invalidate()
+        stats_delta = Counter()
+        for doc in inserted:
+            stats_delta.update(equipment_stats_delta(doc))
+        await apply_stats_delta(stats_delta)
+        await create_history_entries([
+            EquipmentHistory(
+                equipment_id=doc["id"],
+                action="created",
+                description=f"Equipamento importado via planilha: {doc['numero_patrimonio']}",
+                user=username
+            )
+            for doc in inserted
+        ])
+        success_count += len(inserted)
+    
+    return success_count, errors
+
+# Background Import Jobs
+IMPORT_JOB_MAX_ERRORS = 1000
+IMPORT_JOB_HEARTBEAT_SECONDS = 30
+IMPORT_JOB_STALE_SECONDS = IMPORT_JOB_HEARTBEAT_SECONDS * 4
+import_tasks = set()
+
+async def keep_import_job_alive(job_id: str):
+    """Refresh the job's heartbeat while it runs, so a job whose worker died can be told apart"""
+    while True:
+        await asyncio.sleep(IMPORT_JOB_HEARTBEAT_SECONDS)
+        await db.import_jobs.update_one(
+            {"id": job_id},
+            {"$set": {"heartbeat_at": datetime.now(timezone.utc).isoformat()}}
+        )
+
+async def fail_stale_import_jobs():
+    """Jobs are in-process tasks; fail the queued/running ones whose worker stopped sending heartbeats"""
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(seconds=IMPORT_JOB_STALE_SECONDS)).isoformat()
+    result = await db.import_jobs.update_many(
+        {
+            "status": {"$in": ["queued", "running"]},
+            "$or": [{"heartbeat_at": {"$lt": cutoff}}, {"heartbeat_at": None}]
+        },
+        {"$set": {
+            "status": "failed",
+            "detail": "Importação interrompida: o servidor foi reiniciado. Envie o arquivo novamente",
+            "finished_at": now.isoformat()
+        }}
+    )
+    if result.modified_count:
+        logger.warning(f"Marked {result.modified_count} interrupted import job(s) as failed")
+
+def iter_import_blocks(path: str, filename: str):
+    """Yield the spreadsheet as DataFrame blocks indexed by sheet line, without materializing the whole file"""
+    if filename.lower().endswith('.csv'):
+        # Chunks keep counting the row index, and blank lines are kept until then so it matches the file
+        for df in pd.read_csv(
+            path, dtype=str, sep=None, engine="python", encoding="utf-8-sig",
+            skip_blank_lines=False, chunksize=BULK_WRITE_BATCH_SIZE
+        ):
+            yield with_sheet_lines(df)
+        return
+    if filename.lower().endswith('.xls'):
+        # Legacy .xls is not readable by openpyxl, so it is loaded at once
+        df = with_sheet_lines(pd.read_excel(path, dtype=str))
+        for offset in range(0, len(df), BULK_WRITE_BATCH_SIZE):
+            yield df.iloc[offset:offset + BULK_WRITE_BATCH_SIZE]
+        return
+    
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [f"Unnamed: {i}" if col is None else str(col) for i, col in enumerate(next(rows, ()))]
+        block, lines = [], []
+        yielded = False
+        for line, row in enumerate(rows, start=2):
+            if all(value is None for value in row):
+                continue
+            block.append([None if value is None else str(value) for value in row])
+            lines.append(line)
+            if len(block) == BULK_WRITE_BATCH_SIZE:
+                yield pd.DataFrame(block, columns=header, index=lines)
+                block, lines = [], []
+                yielded = True
+        if block or not yielded:
+            yield pd.DataFrame(block, columns=header, index=lines)
+    finally:
+        workbook.close()
+
+async def run_import_job(job_id: str, path: str, filename: str, username: str):
+    started = datetime.now(timezone.utc)
+    await db.import_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"status": "running", "started_at": started.isoformat(), "heartbeat_at": started.isoformat()}}
+    )
+    heartbeat = asyncio.create_task(keep_import_job_alive(job_id))
+    try:
+        blocks = iter_import_blocks(path, filename)
+        seen = set()
+        first_block = True
+        while (df := await run_spreadsheet_task(next, blocks, None, wait=True)) is not None:
+            df.columns = [str(col).strip() for col in df.columns]
+            if first_block:
+                check_import_columns(df.columns)
+                first_block = False
+            success_count, errors = await import_equipment_frame(df, username, seen, background=True)
+            await db.import_jobs.update_one(
+                {"id": job_id},
+                {
+                    "$inc": {"rows_processed": len(df), "success_count": success_count, "error_count": len(errors)},
+                    "$push": {"errors": {"$each": [errors[n] for n in sorted(errors)], "$slice": IMPORT_JOB_MAX_ERRORS}}
+                }
+            )
+        status_value, detail = "completed", None
+    except HTTPException as e:
+        status_value, detail = "failed", e.detail
+    except Exception as e:
+        logger.exception(f"Import job {job_id} failed")
+        status_value, detail = "failed", f"Erro ao processar arquivo: {str(e)}"
+    finally:
+        heartbeat.cancel()
+        Path(path).unlink(missing_ok=True)
+    
+    await db.import_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"status": status_value, "detail": detail, "finished_at": datetime.now(timezone.utc).isoformat()}}
+    )
+
+async def enqueue_import_job(file: UploadFile, username: str) -> JSONResponse:
+    suffix = Path(file.filename).suffix.lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        async for chunk in upload_chunks(file):
+            await run_in_threadpool(tmp.write, chunk)
+    
+    job = ImportJob(
+        filename=file.filename, user=username,
+        worker_id=WORKER_ID, heartbeat_at=datetime.now(timezone.utc).isoformat()
+    )
+    await db.import_jobs.insert_one(job.model_dump())
+    
+    task = asyncio.create_task(run_import_job(job.id, tmp.name, file.filename, username))
+    import_tasks.add(task)
+    task.add_done_callback(import_tasks.discard)
+    
+    return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status})
+
 @api_router.post("/import/equipments")
 async def import_equipments(
     file: UploadFile = File(...),
+    background: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Import equipments from Excel file"""
-    if not file.filename.endswith(('.xlsx', '.xls')):
-        raise HTTPException(status_code=400, detail="Apenas arquivos Excel (.xlsx, .xls) são permitidos")
+    """Import equipments from an Excel or CSV file, optionally as a background job"""
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+        raise HTTPException(status_code=400, detail="Apenas arquivos Excel (.xlsx, .xls) ou CSV são permitidos")
+    
+    if background:
+        return await enqueue_import_job(file, current_user["username"])
     
     try:
-        # Read Excel file
         content = await file.read()
-        df = pd.read_excel(io.BytesIO(content))
-        
-        # Required columns
-        required_columns = [
-            "numero_patrimonio", "numero_serie", "marca", "modelo",
-            "tipo_equipamento", "departamento_atual", "status"
-        ]
-        
-        # Check if all required columns exist
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Colunas obrigatórias faltando: {', '.join(missing_columns)}"
-            )
-        
-        # Process each row
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Check if patrimonio already exists
-                existing = await db.equipments.find_one({
-                    "numero_patrimonio": str(row["numero_patrimonio"])
-                })
-                
-                if existing:
-                    errors.append(f"Linha {index + 2}: Patrimônio {row['numero_patrimonio']} já existe")
-                    error_count += 1
-                    continue
-                
-                # Create equipment object
-                equipment_data = {
-                    "numero_patrimonio": str(row["numero_patrimonio"]),
-                    "numero_serie": str(row["numero_serie"]),
-                    "marca": str(row["marca"]),
-                    "modelo": str(row["modelo"]),
-                    "tipo_equipamento": str(row["tipo_equipamento"]),
-                    "departamento_atual": str(row["departamento_atual"]),
-                    "responsavel_atual": str(row.get("responsavel_atual", "")) if pd.notna(row.get("responsavel_atual")) else None,
-                    "status": str(row.get("status", "Disponível"))
-                }
-                
-                equipment_obj = Equipment(**equipment_data)
-                await db.equipments.insert_one(equipment_obj.model_dump())
-                
-                # Create history entry
-                await create_history_entry(
-                    equipment_obj.id,
-                    "created",
-                    f"Equipamento importado via Excel: {equipment_data['numero_patrimonio']}",
-                    current_user["username"]
-                )
-                
-                success_count += 1
-                
-            except Exception as e:
-                errors.append(f"Linha {index + 2}: {str(e)}")
-                error_count += 1
-        
-        return {
-            "message": "Importação concluída",
-            "success_count": success_count,
-            "error_count": error_count,
-            "errors": errors[:10] if errors else []  # Return first 10 errors
-        }
-        
+        df = await run_spreadsheet_task(read_import_file, file.filename, content)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erro ao processar arquivo: {str(e)}")
-
-@api_router.get("/export/loans")
-async def export_loans(current_user: dict = Depends(get_current_user)):
-    loans = await db.loans.find({}, {"_id": 0}).to_list(1000)
     
-    # Convert equipment arrays to strings
-    for loan in loans:
-        loan['equipments'] = ', '.join(loan['equipments'])
+    check_import_columns(df.columns)
     
-    df = pd.DataFrame(loans)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Empréstimos')
-    output.seek(0)
+    success_count, errors = await import_equipment_frame(df, current_user["username"], set())
     
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=emprestimos.xlsx"}
-    )
+    return {
+        "message": "Importação concluída",
+        "success_count": success_count,
+        "error_count": len(errors),
+        "errors": [errors[line] for line in sorted(errors)]
+    }
+
+@api_router.get("/import/jobs/{job_id}")
+async def get_import_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    job = await db.import_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada")
+    if job["user"] != current_user["username"] and current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Acesso negado")
+    
+    rows_per_second = None
+    if job["started_at"]:
+        end = datetime.fromisoformat(job["finished_at"]) if job["finished_at"] else datetime.now(timezone.utc)
+        elapsed = (end - datetime.fromisoformat(job["started_at"])).total_seconds()
+        rows_per_second = round(job["rows_processed"] / elapsed, 1) if elapsed > 0 else None
+    
+    return {**job, "rows_per_second": rows_per_second}
+
+@api_router.get("/export/loans")
+async def export_loans(
+    status_devolucao: Optional[str] = None,
+    search: Optional[str] = None,
+    format: str = Query("xlsx", pattern="^(xlsx|csv|ndjson)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    query = build_loan_query(status_devolucao, search)
+    return await export_response(db.loans, query, LOAN_EXPORT_COLUMNS, format, "emprestimos", "Empréstimos")
 
 # Dashboard Stats
+def stats_breakdown(counters: dict) -> dict:
+    return {stat_label(key): count for key, count in counters.items() if count > 0}
+
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
-    total_equipments = await db.equipments.count_documents({})
-    available = await db.equipments.count_documents({"status": "Disponível"})
-    loaned = await db.equipments.count_documents({"status": "Emprestado"})
-    maintenance = await db.equipments.count_documents({"status": "Manutenção"})
+    stats = await secondary_reads(db.stats).find_one({"_id": STATS_ID}) or await rebuild_dashboard_stats()
+    equipment_status = stats.get("equipment_status", {})
+    loan_status = stats.get("loan_status", {})
     
-    active_loans = await db.loans.count_documents({"status_devolucao": "Pendente"})
-    overdue_loans = await db.loans.count_documents({"status_devolucao": "Atrasado"})
+    return {
+        "total_equipments": stats.get("equipments_total", 0),
+        "available": equipment_status.get(stat_key("Disponível"), 0),
+        "loaned": equipment_status.get(stat_key("Emprestado"), 0),
+        "maintenance": equipment_status.get(stat_key("Manutenção"), 0),
+        "active_loans": loan_status.get(stat_key("Pendente"), 0),
+        "overdue_loans": loan_status.get(stat_key("Atrasado"), 0),
+        "by_status": stats_breakdown(equipment_status),
+        "by_tipo": stats_breakdown(stats.get("equipment_tipo", {})),
+        "by_departamento": stats_breakdown(stats.get("equipment_departamento", {})),
+        "updated_at": stats.get("updated_at")
+    }
+
+# Reports
+report_cache = TTLCache(REPORT_CACHE_TTL_SECONDS, 256)
+
+def report_window(start: Optional[str], end: Optional[str]) -> tuple:
+    """Resolve the [start, end) window; the default is the last REPORT_DEFAULT_WINDOW_DAYS whole days"""
+    try:
+        if end:
+            end_dt = parse_datetime(end)
+            if len(end) == 10:
+                # A bare date includes the whole day
+                end_dt += timedelta(days=1)
+        else:
+            # Whole days keep the default window, and so its cache key, stable through the day
+            end_dt = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        start_dt = parse_datetime(start) if start else end_dt - timedelta(days=REPORT_DEFAULT_WINDOW_DAYS)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Data inválida")
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="Período inválido")
+    return start_dt, end_dt
+
+async def cached_report(name: str, start: Optional[str], end: Optional[str], build, *args) -> dict:
+    start_dt, end_dt = report_window(start, end)
+    key = json.dumps([name, start_dt.isoformat(), end_dt.isoformat(), *args])
+    report = report_cache.get(key)
+    if report is None:
+        report = {
+            "start": start_dt.isoformat(),
+            "end": end_dt.isoformat(),
+            **await build(start_dt, end_dt, *args),
+            "generated_at": datetime.now(timezone.utc).isoformat()
+        }
+        report_cache.set(key, report)
+    return report
+
+def loans_in_window(start: datetime, end: datetime) -> dict:
+    return {"$match": {"data_emprestimo_dt": {"$gte": start, "$lt": end}}}
+
+async def build_utilization_report(start: datetime, end: datetime, limit: int) -> dict:
+    window_ms = (end - start).total_seconds() * 1000
+    # Loans still out count up to now; each loan contributes its overlap with the window
+    loaned_ms = {"$max": [0, {"$subtract": [
+        {"$min": [{"$ifNull": ["$data_devolucao_real_dt", datetime.now(timezone.utc)]}, end]},
+        {"$max": ["$data_emprestimo_dt", start]}
+    ]}]}
+    result = await secondary_reads(db.loans).aggregate([
+        {"$match": {
+            "data_emprestimo_dt": {"$lt": end},
+            "$or": [{"data_devolucao_real_dt": {"$gte": start}}, {"data_devolucao_real_dt": None}]
+        }},
+        {"$project": {"_id": 0, "equipments": 1, "loaned_ms": loaned_ms}},
+        {"$unwind": "$equipments"},
+        {"$group": {"_id": "$equipments", "loaned_ms": {"$sum": "$loaned_ms"}, "loans": {"$sum": 1}}},
+        {"$facet": {
+            "top": [{"$sort": {"loaned_ms": -1, "_id": 1}}, {"$limit": limit}],
+            "totals": [{"$group": {"_id": None, "loaned_ms": {"$sum": "$loaned_ms"}, "equipments": {"$sum": 1}}}]
+        }}
+    ]).to_list(1)
+    top = result[0]["top"] if result else []
+    totals = result[0]["totals"][0] if result and result[0]["totals"] else {"loaned_ms": 0, "equipments": 0}
+    total_equipments = await secondary_reads(db.equipments).count_documents({})
     
     return {
         "total_equipments": total_equipments,
-        "available": available,
-        "loaned": loaned,
-        "maintenance": maintenance,
-        "active_loans": active_loans,
-        "overdue_loans": overdue_loans
+        "loaned_equipments": totals["equipments"],
+        "average_utilization": round(100 * totals["loaned_ms"] / (window_ms * total_equipments), 2) if total_equipments else 0,
+        "equipments": [
+            {
+                "numero_patrimonio": row["_id"],
+                "loans": row["loans"],
+                "loaned_days": round(row["loaned_ms"] / 86400000, 2),
+                "utilization": round(100 * row["loaned_ms"] / window_ms, 2)
+            }
+            for row in top
+        ]
+    }
+
+def loan_duration_summary(rows: List[dict]) -> List[dict]:
+    df = pd.DataFrame(rows, columns=["departamento", "days"])
+    grouped = df.groupby("departamento")["days"]
+    summary = grouped.agg(["count", "mean"]).join(grouped.quantile([0.5, 0.9, 0.95]).unstack())
+    summary = summary.sort_values("count", ascending=False).round(2)
+    return [
+        {
+            "departamento": departamento,
+            "loans": int(row["count"]),
+            "mean_days": row["mean"],
+            "p50_days": row[0.5],
+            "p90_days": row[0.9],
+            "p95_days": row[0.95]
+        }
+        for departamento, row in summary.iterrows()
+    ]
+
+async def build_loan_duration_report(start: datetime, end: datetime) -> dict:
+    rows = await secondary_reads(db.loans).aggregate([
+        loans_in_window(start, end),
+        {"$match": {"data_devolucao_real_dt": {"$ne": None}}},
+        {"$project": {
+            "_id": 0,
+            "departamento": "$departamento_solicitante",
+            "days": {"$divide": [{"$subtract": ["$data_devolucao_real_dt", "$data_emprestimo_dt"]}, 86400000]}
+        }}
+    ]).to_list(None)
+    departments = await run_spreadsheet_task(loan_duration_summary, rows) if rows else []
+    return {"returned_loans": len(rows), "departments": departments}
+
+async def build_overdue_rate_report(start: datetime, end: datetime) -> dict:
+    # Overdue means returned after the due date or still out past it, whether or not the sweeper ran yet
+    overdue = {"$gt": [
+        {"$ifNull": ["$data_devolucao_real_dt", datetime.now(timezone.utc)]},
+        "$data_prevista_devolucao_dt"
+    ]}
+    rows = await secondary_reads(db.loans).aggregate([
+        loans_in_window(start, end),
+        {"$group": {
+            "_id": "$departamento_solicitante",
+            "loans": {"$sum": 1},
+            "overdue": {"$sum": {"$cond": [overdue, 1, 0]}}
+        }},
+        {"$sort": {"loans": -1, "_id": 1}}
+    ]).to_list(None)
+    departments = [
+        {"departamento": row["_id"], "loans": row["loans"], "overdue": row["overdue"],
+         "overdue_rate": round(100 * row["overdue"] / row["loans"], 2)}
+        for row in rows
+    ]
+    departments.sort(key=lambda row: row["overdue_rate"], reverse=True)
+    return {"departments": departments}
+
+async def build_top_tipos_report(start: datetime, end: datetime, limit: int) -> dict:
+    rows = await secondary_reads(db.loans).aggregate([
+        loans_in_window(start, end),
+        {"$project": {"_id": 0, "equipments": 1}},
+        {"$unwind": "$equipments"},
+        {"$lookup": {
+            "from": "equipments",
+            "localField": "equipments",
+            "foreignField": "numero_patrimonio",
+            "as": "equipment"
+        }},
+        {"$unwind": "$equipment"},
+        {"$group": {"_id": "$equipment.tipo_equipamento", "requests": {"$sum": 1}}},
+        {"$sort": {"requests": -1, "_id": 1}},
+        {"$limit": limit}
+    ]).to_list(None)
+    return {"tipos": [{"tipo_equipamento": row["_id"], "requests": row["requests"]} for row in rows]}
+
+@api_router.get("/reports/utilization")
+async def get_utilization_report(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user)
+):
+    """Share of the window each equipment spent on loan, most used first"""
+    return await cached_report("utilization", start, end, build_utilization_report, limit)
+
+@api_router.get("/reports/loan-duration")
+async def get_loan_duration_report(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Mean and percentile loan duration by requesting department"""
+    return await cached_report("loan-duration", start, end, build_loan_duration_report)
+
+@api_router.get("/reports/overdue-rate")
+async def get_overdue_rate_report(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Share of each department's loans that went overdue"""
+    return await cached_report("overdue-rate", start, end, build_overdue_rate_report)
+
+@api_router.get("/reports/top-tipos")
+async def get_top_tipos_report(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Most requested equipment types"""
+    return await cached_report("top-tipos", start, end, build_top_tipos_report, limit)
+
+# Admin Routes
+@api_router.get("/admin/query-plans")
+async def get_query_plans(current_user: dict = Depends(get_admin_user)):
+    """Explain each route's canonical query and flag collection scans"""
+    results = await explain_canonical_queries()
+    return {
+        "collscan_count": sum(result["collscan"] for result in results),
+        "plans": results
     }
 
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(current_user: dict = Depends(get_admin_user)):
+    return {"user_cache": user_cache.stats()}
+
+@api_router.post("/admin/dashboard-stats/rebuild")
+async def rebuild_dashboard_stats_route(current_user: dict = Depends(get_admin_user)):
+    """Recount the materialized dashboard counters from the collections"""
+    stats = await rebuild_dashboard_stats()
+    return {"message": "Estatísticas recalculadas", "rebuilt_at": stats["rebuilt_at"]}
+
 # Public Routes (No authentication required)
-@api_router.get("/public/equipments/available", response_model=List[Equipment])
-async def get_available_equipments_public():
+@api_router.get(
+    "/public/equipments/available",
+    response_model=PublicEquipmentPage,
+    dependencies=[Depends(check_public_rate_limit)]
+)
+async def get_available_equipments_public(
+    tipo: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None)
+):
     """Public endpoint to get available equipments for loan requests"""
-    equipments = await db.equipments.find(
-        {"status": "Disponível"},
-        {"_id": 0}
-    ).to_list(1000)
-    return equipments
-
-@api_router.post("/public/loan-request", response_model=Loan)
-async def create_public_loan_request(loan: LoanCreate):
-    """Public endpoint for users to request equipment loans"""
-    # Verify all equipments exist and are available
-    for patrimonio in loan.equipments:
-        equipment = await db.equipments.find_one({"numero_patrimonio": patrimonio})
-        if not equipment:
-            raise HTTPException(status_code=404, detail=f"Equipamento {patrimonio} não encontrado")
-        if equipment["status"] == "Emprestado":
-            raise HTTPException(status_code=400, detail=f"Equipamento {patrimonio} já está emprestado")
+    catalog = await public_catalog.get()
+    headers = {
+        "ETag": catalog.etag,
+        "Last-Modified": catalog.last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+        "Cache-Control": "no-cache"
+    }
     
-    loan_obj = Loan(**loan.model_dump())
-    await db.loans.insert_one(loan_obj.model_dump())
+    # A page is fully determined by the catalog version and the query string, so the catalog ETag validates it
+    if if_none_match is not None:
+        not_modified = if_none_match.strip() == "*" or catalog.etag in [tag.strip() for tag in if_none_match.split(",")]
+    elif if_modified_since is not None:
+        try:
+            not_modified = catalog.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            not_modified = False
+    else:
+        not_modified = False
+    if not_modified:
+        return Response(status_code=304, headers=headers)
     
-    # Update equipment status
-    for patrimonio in loan.equipments:
-        await db.equipments.update_one(
-            {"numero_patrimonio": patrimonio},
-            {"$set": {"status": "Emprestado", "updated_at": datetime.now(timezone.utc).isoformat()}}
-        )
-        
-        equipment = await db.equipments.find_one({"numero_patrimonio": patrimonio})
-        await create_history_entry(
-            equipment["id"],
-            "loaned",
-            f"Emprestado para {loan.nome_solicitante} (Solicitação Pública)",
-            "Sistema - Solicitação Pública"
-        )
+    items = catalog.items
+    if tipo:
+        items = [item for item in items if item["tipo_equipamento"] == tipo]
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    page = items[offset:offset + limit]
+    next_cursor = encode_offset_cursor(offset + limit) if offset + limit < len(items) else None
+    return ORJSONResponse({"items": page, "next_cursor": next_cursor}, headers=headers)
+
+@api_router.post("/public/loan-request", response_model=Loan, dependencies=[Depends(check_public_rate_limit)])
+async def create_public_loan_request(loan: LoanCreate, background_tasks: BackgroundTasks):
+    """Public endpoint for users to request equipment loans"""
+    loan_obj = await lend_equipments(
+        loan,
+        f"Emprestado para {loan.nome_solicitante} (Solicitação Pública)",
+        "Sistema - Solicitação Pública"
+    )
     
-    # Create notification for admin users
-    admin_users = await db.users.find({"role": "admin"}, {"_id": 0}).to_list(100)
-    for admin in admin_users:
-        await create_notification(
-            admin["id"],
-            f"Nova solicitação de empréstimo: {loan.nome_solicitante} - {len(loan.equipments)} equipamento(s)",
-            "loan_created"
-        )
+    # Notify the admins after the response is sent, so latency does not grow with the number of admins
+    background_tasks.add_task(
+        notify_admins,
+        f"Nova solicitação de empréstimo: {loan_obj.nome_solicitante} - {len(loan_obj.equipments)} equipamento(s)",
+        "loan_created"
+    )
     
     return loan_obj
 
 app.include_router(api_router)
 
+class CompressionMiddleware(GZipMiddleware):
+    """GZip responses above GZIP_MINIMUM_SIZE, except streams that must reach the client unbuffered"""
+    # zlib holds back small writes, which would stall SSE events; termo downloads serve byte ranges
+    excluded_paths = re.compile(r"^/api/(notifications/stream|equipments/[^/]+/termo)$")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.excluded_paths.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -693,6 +3117,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -700,10 +3125,220 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Metrics
+def prometheus_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prometheus_labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{prometheus_label_value(value)}"' for key, value in labels.items()) + "}"
+
+class MetricsRegistry:
+    """Process-local counters and histograms rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.latency = {}  # (method, route) -> [bucket counts..., sum, count]
+        self.responses = Counter()  # (method, route, status)
+        self.request_db_commands = Counter()  # (method, route)
+        self.request_db_seconds = Counter()
+        self.db_commands = Counter()  # command name
+        self.db_seconds = Counter()
+        # observe_db_command runs on Motor's executor threads, concurrently with the event loop
+        self._lock = threading.Lock()
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float, request_metrics: RequestMetrics):
+        key = (method, route)
+        with self._lock:
+            series = self.latency.setdefault(key, [0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += seconds
+            series[-1] += 1
+            self.responses[(method, route, status_code)] += 1
+            self.request_db_commands[key] += request_metrics.db_commands
+            self.request_db_seconds[key] += request_metrics.db_seconds
+
+    def observe_db_command(self, command_name: str, seconds: float):
+        with self._lock:
+            self.db_commands[command_name] += 1
+            self.db_seconds[command_name] += seconds
+
+    def render(self) -> str:
+        with self._lock:
+            lines = self._render_requests()
+        cache = user_cache.stats()
+        lines += [
+            "# HELP user_cache_hits_total Authenticated-user cache hits",
+            "# TYPE user_cache_hits_total counter",
+            f"user_cache_hits_total {cache['hits']}",
+            "# HELP user_cache_misses_total Authenticated-user cache misses",
+            "# TYPE user_cache_misses_total counter",
+            f"user_cache_misses_total {cache['misses']}",
+            "# HELP user_cache_size Cached user records",
+            "# TYPE user_cache_size gauge",
+            f"user_cache_size {cache['size']}",
+        ]
+        pools = pool_monitor.snapshot()
+        for name, key, kind, help_text in [
+            ("mongo_pool_connections", "open", "gauge", "Open connections in this worker's pool, by server"),
+            ("mongo_pool_connections_in_use", "in_use", "gauge", "Connections checked out, by server"),
+            ("mongo_pool_wait_queue", "waiting", "gauge", "Operations waiting for a connection, by server"),
+            ("mongo_pool_checkout_failures_total", "checkout_failures", "counter", "Failed connection check-outs, by server"),
+        ]:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for address, pool in sorted(pools.items()):
+                lines.append(f"{name}{prometheus_labels(server=address)} {pool[key]}")
+        return "\n".join(lines) + "\n"
+
+    def _render_requests(self) -> list:
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being served",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), series in sorted(self.latency.items()):
+            for bound, count in zip(LATENCY_BUCKETS, series):
+                lines.append(f"http_request_duration_seconds_bucket{prometheus_labels(method=method, route=route, le=bound)} {count}")
+            lines.append(f"http_request_duration_seconds_bucket{prometheus_labels(method=method, route=route, le='+Inf')} {series[-1]}")
+            lines.append(f"http_request_duration_seconds_sum{prometheus_labels(method=method, route=route)} {series[-2]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{prometheus_labels(method=method, route=route)} {series[-1]}")
+        lines += ["# HELP http_responses_total Responses by route and status code", "# TYPE http_responses_total counter"]
+        for (method, route, status_code), count in sorted(self.responses.items()):
+            lines.append(f"http_responses_total{prometheus_labels(method=method, route=route, status=status_code)} {count}")
+        lines += ["# HELP http_request_db_commands_total Mongo commands issued by requests, by route", "# TYPE http_request_db_commands_total counter"]
+        for (method, route), count in sorted(self.request_db_commands.items()):
+            lines.append(f"http_request_db_commands_total{prometheus_labels(method=method, route=route)} {count}")
+        lines += ["# HELP http_request_db_seconds_total Time spent in Mongo commands by route", "# TYPE http_request_db_seconds_total counter"]
+        for (method, route), seconds in sorted(self.request_db_seconds.items()):
+            lines.append(f"http_request_db_seconds_total{prometheus_labels(method=method, route=route)} {seconds:.6f}")
+        lines += ["# HELP mongo_commands_total Mongo commands by name", "# TYPE mongo_commands_total counter"]
+        for command_name, count in sorted(self.db_commands.items()):
+            lines.append(f"mongo_commands_total{prometheus_labels(command=command_name)} {count}")
+        lines += ["# HELP mongo_command_seconds_total Mongo command time by name", "# TYPE mongo_command_seconds_total counter"]
+        for command_name, seconds in sorted(self.db_seconds.items()):
+            lines.append(f"mongo_command_seconds_total{prometheus_labels(command=command_name)} {seconds:.6f}")
+        return lines
+
+metrics_registry = MetricsRegistry()
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed until their last chunk"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        request_metrics = RequestMetrics()
+        token = current_request_metrics.set(request_metrics)
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        metrics_registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics_registry.in_flight -= 1
+            current_request_metrics.reset(token)
+            # The matched route template keeps label cardinality bounded; unmatched paths share one series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics_registry.observe_request(scope["method"], route, status_code, elapsed, request_metrics)
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                logger.warning(
+                    f"Slow request {scope['method']} {scope['path']} ({route}) -> {status_code} in {elapsed:.3f}s, "
+                    f"{request_metrics.db_commands} Mongo command(s) in {request_metrics.db_seconds:.3f}s: "
+                    f"{'; '.join(request_metrics.commands)}"
+                )
+
+app.add_middleware(MetricsMiddleware)
+
+def require_metrics_token(request: Request):
+    """Operational endpoints are off unless METRICS_TOKEN is set, and then need it as a Bearer token"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token inválido", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def get_metrics():
+    return Response(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+# Health
+HEALTH_PING_TIMEOUT_SECONDS = 2
+
+@app.get("/health/live", include_in_schema=False)
+async def get_liveness():
+    return {"status": "ok"}
+
+async def ping_primary() -> Optional[float]:
+    """Round trip of a ping to the primary in ms, or None if it doesn't answer in time"""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), HEALTH_PING_TIMEOUT_SECONDS)
+    except (PyMongoError, asyncio.TimeoutError) as e:
+        logger.warning(f"Readiness ping failed: {str(e) or type(e).__name__}")
+        return None
+    return (time.perf_counter() - started) * 1000
+
+@app.get("/health/ready", include_in_schema=False)
+async def get_readiness():
+    """Ready once the primary answers a ping; public, so it reports nothing about the deployment"""
+    if await ping_primary() is None:
+        return ORJSONResponse({"status": "unavailable"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/health/details", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def get_health_details():
+    """Readiness plus server round-trip times and this worker's pool, for operators holding METRICS_TOKEN"""
+    ping_ms = await ping_primary()
+    servers = [
+        {
+            "address": f"{host}:{port}",
+            "type": description.server_type_name,
+            "rtt_ms": round(description.round_trip_time * 1000, 2) if description.round_trip_time is not None else None
+        }
+        for (host, port), description in client.topology_description.server_descriptions().items()
+    ]
+    return ORJSONResponse({
+        "status": "unavailable" if ping_ms is None else "ready",
+        "ping_ms": None if ping_ms is None else round(ping_ms, 2),
+        "secondary_reads_max_staleness_seconds": MONGO_SECONDARY_MAX_STALENESS_SECONDS or None,
+        "servers": servers,
+        "pools": pool_monitor.snapshot()
+    }, status_code=503 if ping_ms is None else 200)
+
 @app.on_event("startup")
 async def startup_event():
+    await ensure_indexes()
     await init_db()
+    await migrate_inline_termos()
+    await backfill_search_fields()
+    await backfill_loan_dates()
+    await backfill_model_defaults()
+    await backfill_notification_read_at()
+    await ensure_dashboard_stats()
+    await fail_stale_import_jobs()
+    start_scheduler()
+    await verify_query_plans()
+    await notification_broker.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await stop_scheduler()
+    await notification_broker.stop()
+    password_executor.shutdown(wait=False)
+    spreadsheet_executor.shutdown(wait=False)
     client.close()
\ No newline at end of file
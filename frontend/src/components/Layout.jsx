@@ -23,15 +23,44 @@ const Layout = () => {
   const [sidebarOpen, setSidebarOpen] = useState(false);
 
   useEffect(() => {
-    fetchNotifications();
-    const interval = setInterval(fetchNotifications, 30000); // Poll every 30s
-    return () => clearInterval(interval);
+    // New notifications are pushed over SSE; the list is re-fetched whenever the stream (re)connects.
+    // The stream token expires within a minute, so every reconnect asks for a fresh one.
+    let source = null;
+    let retry = null;
+    let closed = false;
+
+    const connect = async () => {
+      try {
+        const response = await axios.post(`${API}/notifications/stream-token`);
+        if (closed) return;
+        source = new EventSource(`${API}/notifications/stream?token=${encodeURIComponent(response.data.token)}`);
+        source.onopen = fetchNotifications;
+        source.onerror = () => {
+          source.close();
+          retry = setTimeout(connect, 5000);
+        };
+        source.addEventListener('notification', (event) => {
+          const notification = JSON.parse(event.data);
+          setNotifications((current) => [notification, ...current.filter(n => n.id !== notification.id)]);
+        });
+      } catch (error) {
+        console.error('Error connecting to notifications:', error);
+        if (!closed) retry = setTimeout(connect, 5000);
+      }
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) source.close();
+    };
   }, []);
 
   const fetchNotifications = async () => {
     try {
-      const response = await axios.get(`${API}/notifications`);
-      setNotifications(response.data.filter(n => !n.read));
+      const response = await axios.get(`${API}/notifications`, { params: { unread: true } });
+      setNotifications(response.data);
     } catch (error) {
       console.error('Error fetching notifications:', error);
     }
@@ -40,12 +69,21 @@ const Layout = () => {
   const markAsRead = async (id) => {
     try {
       await axios.put(`${API}/notifications/${id}/read`);
-      fetchNotifications();
+      setNotifications((current) => current.filter(n => n.id !== id));
     } catch (error) {
       console.error('Error marking notification as read:', error);
     }
   };
 
+  const markAllAsRead = async () => {
+    try {
+      await axios.put(`${API}/notifications/read`, {});
+      setNotifications([]);
+    } catch (error) {
+      console.error('Error marking notifications as read:', error);
+    }
+  };
+
   const handleLogout = () => {
     logout();
     navigate('/login');
@@ -184,19 +222,29 @@ const Layout = () => {
                       Nenhuma notificação
                     </div>
                   ) : (
-                    notifications.map((notification) => (
+                    <>
+                      {notifications.map((notification) => (
+                        <DropdownMenuItem
+                          key={notification.id}
+                          onClick={() => markAsRead(notification.id)}
+                          className="flex flex-col items-start p-4 cursor-pointer"
+                          data-testid={`notification-item-${notification.id}`}
+                        >
+                          <p className="text-sm font-medium">{notification.message}</p>
+                          <p className="text-xs text-gray-500 mt-1">
+                            {new Date(notification.created_at).toLocaleString('pt-BR')}
+                          </p>
+                        </DropdownMenuItem>
+                      ))}
+                      <DropdownMenuSeparator />
                       <DropdownMenuItem
-                        key={notification.id}
-                        onClick={() => markAsRead(notification.id)}
-                        className="flex flex-col items-start p-4 cursor-pointer"
-                        data-testid={`notification-item-${notification.id}`}
+                        onClick={markAllAsRead}
+                        className="justify-center text-sm text-blue-600 cursor-pointer"
+                        data-testid="mark-all-notifications-read"
                       >
-                        <p className="text-sm font-medium">{notification.message}</p>
-                        <p className="text-xs text-gray-500 mt-1">
-                          {new Date(notification.created_at).toLocaleString('pt-BR')}
-                        </p>
+                        Marcar todas como lidas
                       </DropdownMenuItem>
-                    ))
+                    </>
                   )}
                 </DropdownMenuContent>
               </DropdownMenu>
@@ -19,10 +19,10 @@ const Dashboard = () => {
     try {
       const [statsRes, loansRes] = await Promise.all([
         axios.get(`${API}/dashboard/stats`),
-        axios.get(`${API}/loans`)
+        axios.get(`${API}/loans`, { params: { limit: 5 } })
       ]);
       setStats(statsRes.data);
-      setRecentLoans(loansRes.data.slice(0, 5));
+      setRecentLoans(loansRes.data.items);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     } finally {
@@ -64,7 +64,10 @@ const EquipmentForm = () => {
 
     try {
       if (id) {
-        await axios.put(`${API}/equipments/${id}`, formData);
+        // The version loaded with the form guards against overwriting someone else's edit
+        await axios.put(`${API}/equipments/${id}`, formData, {
+          headers: { 'If-Match': `"${formData.version ?? 0}"` },
+        });
         toast.success('Equipamento atualizado com sucesso');
       } else {
         await axios.post(`${API}/equipments`, formData);
@@ -101,6 +104,7 @@ const EquipmentForm = () => {
         headers: { 'Content-Type': 'multipart/form-data' }
       });
       toast.success('Termo anexado com sucesso');
+      setFormData((prev) => ({ ...prev, has_termo: true }));
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Erro ao anexar termo');
     } finally {
@@ -108,6 +112,18 @@ const EquipmentForm = () => {
     }
   };
 
+  const handleViewTermo = async () => {
+    try {
+      const response = await axios.get(`${API}/equipments/${id}/termo`, {
+        responseType: 'blob'
+      });
+      const url = window.URL.createObjectURL(new Blob([response.data], { type: 'application/pdf' }));
+      window.open(url, '_blank');
+    } catch (error) {
+      toast.error('Erro ao abrir termo');
+    }
+  };
+
   return (
     <div className="space-y-6" data-testid="equipment-form-page">
       <div className="flex items-center space-x-4">
@@ -252,6 +268,11 @@ const EquipmentForm = () => {
                     data-testid="termo-input"
                   />
                   {uploadingPdf && <span className="text-sm text-gray-500">Enviando...</span>}
+                  {formData.has_termo && !uploadingPdf && (
+                    <Button type="button" variant="outline" onClick={handleViewTermo} data-testid="view-termo-button">
+                      Ver termo
+                    </Button>
+                  )}
                 </div>
               </div>
             )}
@@ -4,6 +4,15 @@ import { API, toast } from '@/App';
 import { useNavigate, useParams } from 'react-router-dom';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
+import { Checkbox } from '@/components/ui/checkbox';
+import { Label } from '@/components/ui/label';
+import {
+  Select,
+  SelectContent,
+  SelectItem,
+  SelectTrigger,
+  SelectValue,
+} from '@/components/ui/select';
 import { ArrowLeft, Clock } from 'lucide-react';
 
 const EquipmentHistory = () => {
@@ -11,23 +20,41 @@ const EquipmentHistory = () => {
   const navigate = useNavigate();
   const [equipment, setEquipment] = useState(null);
   const [history, setHistory] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [filterAction, setFilterAction] = useState('');
+  const [includeArchived, setIncludeArchived] = useState(false);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    fetchData();
+    fetchEquipment();
   }, [id]);
 
-  const fetchData = async () => {
+  useEffect(() => {
+    fetchHistory();
+  }, [id, filterAction, includeArchived]);
+
+  const fetchEquipment = async () => {
     try {
-      const [equipmentRes, historyRes] = await Promise.all([
-        axios.get(`${API}/equipments/${id}`),
-        axios.get(`${API}/equipments/${id}/history`)
-      ]);
-      setEquipment(equipmentRes.data);
-      setHistory(historyRes.data);
+      const response = await axios.get(`${API}/equipments/${id}`);
+      setEquipment(response.data);
     } catch (error) {
       toast.error('Erro ao carregar histórico');
       navigate('/equipments');
+    }
+  };
+
+  const fetchHistory = async (cursor = null) => {
+    try {
+      const params = { limit: 50 };
+      if (filterAction && filterAction !== '_all') params.action = filterAction;
+      if (includeArchived) params.include_archived = true;
+      if (cursor) params.cursor = cursor;
+
+      const response = await axios.get(`${API}/equipments/${id}/history`, { params });
+      setHistory(cursor ? [...history, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      toast.error('Erro ao carregar histórico');
     } finally {
       setLoading(false);
     }
@@ -78,8 +105,34 @@ const EquipmentHistory = () => {
       </div>
 
       <Card>
-        <CardHeader>
+        <CardHeader className="flex flex-row items-center justify-between space-y-0">
           <CardTitle>Movimentações</CardTitle>
+          <div className="flex items-center space-x-4">
+            <div className="flex items-center space-x-2">
+              <Checkbox
+                id="include-archived"
+                checked={includeArchived}
+                onCheckedChange={(checked) => setIncludeArchived(checked === true)}
+                data-testid="include-archived-checkbox"
+              />
+              <Label htmlFor="include-archived">Incluir histórico arquivado</Label>
+            </div>
+            <div className="w-48">
+              <Select value={filterAction} onValueChange={setFilterAction}>
+                <SelectTrigger data-testid="filter-history-action">
+                  <SelectValue placeholder="Tipo de movimentação" />
+                </SelectTrigger>
+                <SelectContent>
+                  <SelectItem value="_all">Todas</SelectItem>
+                  <SelectItem value="created">Criado</SelectItem>
+                  <SelectItem value="updated">Atualizado</SelectItem>
+                  <SelectItem value="loaned">Emprestado</SelectItem>
+                  <SelectItem value="returned">Devolvido</SelectItem>
+                  <SelectItem value="termo_uploaded">Termo Anexado</SelectItem>
+                </SelectContent>
+              </Select>
+            </div>
+          </div>
         </CardHeader>
         <CardContent>
           {history.length === 0 ? (
@@ -109,6 +162,13 @@ const EquipmentHistory = () => {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <div className="flex justify-center pt-2">
+                  <Button variant="outline" onClick={() => fetchHistory(nextCursor)} data-testid="load-more-history-button">
+                    Carregar mais
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
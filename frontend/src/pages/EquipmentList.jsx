@@ -42,9 +42,13 @@ const DEPARTAMENTOS = [
 
 const TIPOS_EQUIPAMENTO = ['Notebook', 'Desktop', 'Celular', 'Tablet', 'Monitor', 'Impressora', 'Outros'];
 const STATUS_OPTIONS = ['Disponível', 'Em uso', 'Emprestado', 'Manutenção', 'Baixado'];
+const BACKGROUND_IMPORT_THRESHOLD = 5 * 1024 * 1024;
+// Polled once a second; stop waiting after 30 minutes (the job keeps running on the server)
+const IMPORT_JOB_MAX_POLLS = 1800;
 
 const EquipmentList = () => {
   const [equipments, setEquipments] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
   const [filterTipo, setFilterTipo] = useState('');
@@ -61,16 +65,18 @@ const EquipmentList = () => {
     fetchEquipments();
   }, [filterTipo, filterDepartamento, filterStatus, search]);
 
-  const fetchEquipments = async () => {
+  const fetchEquipments = async (cursor = null) => {
     try {
       const params = {};
       if (filterTipo) params.tipo = filterTipo;
       if (filterDepartamento) params.departamento = filterDepartamento;
       if (filterStatus) params.status = filterStatus;
       if (search) params.search = search;
+      if (cursor) params.cursor = cursor;
 
       const response = await axios.get(`${API}/equipments`, { params });
-      setEquipments(response.data);
+      setEquipments(cursor ? [...equipments, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Erro ao carregar equipamentos');
     } finally {
@@ -91,7 +97,14 @@ const EquipmentList = () => {
 
   const handleExport = async () => {
     try {
+      const params = {};
+      if (filterTipo) params.tipo = filterTipo;
+      if (filterDepartamento) params.departamento = filterDepartamento;
+      if (filterStatus) params.status = filterStatus;
+      if (search) params.search = search;
+
       const response = await axios.get(`${API}/export/equipments`, {
+        params,
         responseType: 'blob'
       });
       const url = window.URL.createObjectURL(new Blob([response.data]));
@@ -125,6 +138,20 @@ const EquipmentList = () => {
     }
   };
 
+  const waitForImportJob = async (jobId) => {
+    for (let poll = 0; poll < IMPORT_JOB_MAX_POLLS; poll++) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const { data: job } = await axios.get(`${API}/import/jobs/${jobId}`);
+      if (job.status === 'failed') {
+        throw { response: { data: { detail: job.detail } } };
+      }
+      if (job.status === 'completed') {
+        return job;
+      }
+    }
+    throw { response: { data: { detail: 'A importação ainda está em andamento. Confira os equipamentos mais tarde' } } };
+  };
+
   const handleImport = async () => {
     if (!importFile) {
       toast.error('Selecione um arquivo para importar');
@@ -138,14 +165,17 @@ const EquipmentList = () => {
       const formData = new FormData();
       formData.append('file', importFile);
 
+      const background = importFile.size > BACKGROUND_IMPORT_THRESHOLD;
       const response = await axios.post(`${API}/import/equipments`, formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
+        headers: { 'Content-Type': 'multipart/form-data' },
+        params: background ? { background: true } : {}
       });
+      const result = background ? await waitForImportJob(response.data.job_id) : response.data;
 
-      setImportResult(response.data);
-      toast.success(`Importação concluída: ${response.data.success_count} equipamentos importados`);
+      setImportResult(result);
+      toast.success(`Importação concluída: ${result.success_count} equipamentos importados`);
       
-      if (response.data.success_count > 0) {
+      if (result.success_count > 0) {
         fetchEquipments();
       }
     } catch (error) {
@@ -321,6 +351,13 @@ const EquipmentList = () => {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={() => fetchEquipments(nextCursor)} data-testid="load-more-button">
+                    Carregar mais
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
@@ -350,7 +387,7 @@ const EquipmentList = () => {
           <DialogHeader>
             <DialogTitle>Importar Equipamentos via Excel</DialogTitle>
             <DialogDescription>
-              Faça upload de uma planilha Excel (.xlsx, .xls) com os dados dos equipamentos
+              Faça upload de uma planilha Excel (.xlsx, .xls) ou CSV com os dados dos equipamentos
             </DialogDescription>
           </DialogHeader>
           
@@ -359,7 +396,7 @@ const EquipmentList = () => {
               <FileSpreadsheet className="mx-auto h-12 w-12 text-gray-400 mb-3" />
               <Input
                 type="file"
-                accept=".xlsx,.xls"
+                accept=".xlsx,.xls,.csv"
                 onChange={(e) => setImportFile(e.target.files[0])}
                 className="max-w-xs mx-auto"
                 data-testid="import-file-input"
@@ -42,10 +42,16 @@ const LoanForm = () => {
 
   const fetchAvailableEquipments = async () => {
     try {
-      const response = await axios.get(`${API}/equipments`, {
-        params: { status: 'Disponível' }
-      });
-      setAvailableEquipments(response.data);
+      const items = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(`${API}/equipments`, {
+          params: { status: 'Disponível', limit: 1000, ...(cursor && { cursor }) }
+        });
+        items.push(...response.data.items);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      setAvailableEquipments(items);
     } catch (error) {
       toast.error('Erro ao carregar equipamentos disponíveis');
     }
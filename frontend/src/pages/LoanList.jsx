@@ -25,6 +25,7 @@ import { Label } from '@/components/ui/label';
 
 const LoanList = () => {
   const [loans, setLoans] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
   const [filterStatus, setFilterStatus] = useState('');
@@ -39,14 +40,16 @@ const LoanList = () => {
     setReturnDate(new Date().toISOString().split('T')[0]);
   }, []);
 
-  const fetchLoans = async () => {
+  const fetchLoans = async (cursor = null) => {
     try {
       const params = {};
       if (filterStatus) params.status_devolucao = filterStatus;
       if (search) params.search = search;
+      if (cursor) params.cursor = cursor;
 
       const response = await axios.get(`${API}/loans`, { params });
-      setLoans(response.data);
+      setLoans(cursor ? [...loans, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Erro ao carregar empréstimos');
     } finally {
@@ -69,7 +72,12 @@ const LoanList = () => {
 
   const handleExport = async () => {
     try {
+      const params = {};
+      if (filterStatus) params.status_devolucao = filterStatus;
+      if (search) params.search = search;
+
       const response = await axios.get(`${API}/export/loans`, {
+        params,
         responseType: 'blob'
       });
       const url = window.URL.createObjectURL(new Blob([response.data]));
@@ -209,6 +217,13 @@ const LoanList = () => {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={() => fetchLoans(nextCursor)} data-testid="load-more-loans-button">
+                    Carregar mais
+                  </Button>
+                </div>
+              )}
             </div>
           )}
         </CardContent>
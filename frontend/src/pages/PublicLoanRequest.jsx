@@ -41,8 +41,16 @@ const PublicLoanRequest = () => {
 
   const fetchAvailableEquipments = async () => {
     try {
-      const response = await axios.get(`${API}/public/equipments/available`);
-      setAvailableEquipments(response.data);
+      const items = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(`${API}/public/equipments/available`, {
+          params: { limit: 1000, ...(cursor && { cursor }) }
+        });
+        items.push(...response.data.items);
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      setAvailableEquipments(items);
     } catch (error) {
       console.error('Erro ao carregar equipamentos:', error);
     }
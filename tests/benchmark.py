@@ -0,0 +1,317 @@
+"""Load and latency benchmark for the hot API paths.
+
+Seeds equipments, loans and history with the server's own models, then drives
+each scenario concurrently through an in-process httpx AsyncClient and prints
+p50/p95/p99 and requests per second as JSON.
+
+    python tests/benchmark.py                                  # mongomock-motor
+    python tests/benchmark.py --mongo-url mongodb://localhost:27017 --equipments 100000
+    python tests/benchmark.py --scenarios list_equipments,search_equipments --output before.json
+
+With --mongo-url the database given by --db-name is dropped and re-seeded, so
+point it at a scratch database. Runs are deterministic for a given --seed,
+which keeps results comparable across commits.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+USERNAME = "dedianit"
+PASSWORD = "diadema123"
+SEED_BATCH_SIZE = 5000
+
+MARCAS = ["Dell", "HP", "Lenovo", "Positivo", "Samsung", "LG", "Acer", "Epson"]
+TIPOS = ["Notebook", "Desktop", "Monitor", "Impressora", "Celular", "Tablet"]
+DEPARTAMENTOS = ["SEINTEC", "PROTOCOLO", "SEFIN", "SEGRE", "SECOMSE", "URE", "AT", "ESE"]
+NOMES = ["Ana Souza", "Bruno Lima", "Carla Dias", "Diego Alves", "Elisa Rocha", "Fábio Nunes"]
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(0.50) * 1000, 2),
+        "p95_ms": round(pick(0.95) * 1000, 2),
+        "p99_ms": round(pick(0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+    }
+
+
+def load_server(args):
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    # The benchmark logs in far more often than a person would
+    for name in ("USERNAME", "IP"):
+        os.environ[f"LOGIN_RATE_LIMIT_{name}_BURST"] = "1000000"
+        os.environ[f"LOGIN_RATE_LIMIT_{name}_PER_MINUTE"] = "1000000"
+    os.environ["PUBLIC_RATE_LIMIT_BURST"] = "1000000"
+    os.environ["PUBLIC_RATE_LIMIT_PER_MINUTE"] = "1000000"
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    if not args.mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db_name]
+    return server
+
+
+async def insert_batched(collection, docs):
+    for offset in range(0, len(docs), SEED_BATCH_SIZE):
+        await collection.insert_many(docs[offset:offset + SEED_BATCH_SIZE], ordered=False)
+
+
+async def seed(server, args, rng):
+    """Insert the dataset through the server's models so documents match what the API writes"""
+    await server.client.drop_database(args.db_name)
+    await server.ensure_indexes()
+    await server.init_db()
+
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    equipments = []
+    for i in range(args.equipments):
+        # The first --loan-pool equipments stay available for the loan scenarios
+        status = "Disponível" if i < args.loan_pool else rng.choice(["Disponível", "Em uso", "Manutenção", "Baixado"])
+        created = (start + timedelta(minutes=i)).isoformat()
+        doc = server.Equipment(
+            numero_patrimonio=f"BENCH-{i:07d}",
+            numero_serie=f"SN{rng.randrange(10 ** 9):09d}",
+            marca=rng.choice(MARCAS),
+            modelo=f"Modelo {rng.randrange(500)}",
+            tipo_equipamento=rng.choice(TIPOS),
+            departamento_atual=rng.choice(DEPARTAMENTOS),
+            status=status,
+            created_at=created,
+            updated_at=created,
+        ).model_dump()
+        doc.update(server.search_fields(doc, server.SEARCH_FIELDS["equipments"]))
+        equipments.append(doc)
+    await insert_batched(server.db.equipments, equipments)
+
+    loans = []
+    for i in range(args.loans):
+        emprestimo = start + timedelta(hours=i)
+        doc = server.Loan(
+            data_emprestimo=emprestimo.isoformat(),
+            nome_solicitante=rng.choice(NOMES),
+            departamento_solicitante=rng.choice(DEPARTAMENTOS),
+            data_prevista_devolucao=(emprestimo + timedelta(days=rng.randrange(1, 30))).isoformat(),
+            data_devolucao_real=(emprestimo + timedelta(days=rng.randrange(1, 30))).isoformat(),
+            status_devolucao="Devolvido",
+            equipments=[equipments[rng.randrange(len(equipments))]["numero_patrimonio"]] if equipments else [],
+            created_at=emprestimo.isoformat(),
+        ).model_dump()
+        doc.update(server.loan_date_fields(doc))
+        doc.update(server.search_fields(doc, server.SEARCH_FIELDS["loans"]))
+        loans.append(doc)
+    await insert_batched(server.db.loans, loans)
+
+    history = [
+        server.EquipmentHistory(
+            equipment_id=equipments[rng.randrange(len(equipments))]["id"],
+            action=rng.choice(["created", "updated", "loaned", "returned"]),
+            description="Carga de benchmark",
+            user=rng.choice([USERNAME, "sistema"]),
+            timestamp=(start + timedelta(seconds=30 * i)).isoformat(),
+        ).model_dump()
+        for i in range(args.history if equipments else 0)
+    ]
+    await insert_batched(server.db.equipment_history, history)
+
+    await server.rebuild_dashboard_stats()
+    return equipments
+
+
+def import_csv(batch: int, rows: int) -> bytes:
+    buffer = io.StringIO()
+    buffer.write("numero_patrimonio,numero_serie,marca,modelo,tipo_equipamento,departamento_atual,responsavel_atual,status\n")
+    for i in range(rows):
+        buffer.write(f"IMPORT-{batch:05d}-{i:05d},SN{batch}{i},Dell,Latitude,Notebook,SEINTEC,,Disponível\n")
+    return buffer.getvalue().encode("utf-8")
+
+
+def build_scenarios(args, equipments, rng):
+    """Each scenario is (name, number of requests, request factory taking the request index)"""
+    pool = [doc["numero_patrimonio"] for doc in equipments[:args.loan_pool]]
+    loan_ids = []
+    search_terms = [rng.choice(MARCAS) for _ in range(args.requests)]
+    heavy_requests = max(1, args.requests // 20)
+
+    async def login(client, i):
+        return await client.post("/api/auth/login", json={"username": USERNAME, "password": PASSWORD})
+
+    async def list_equipments(client, i):
+        return await client.get("/api/equipments", params={"limit": 100})
+
+    async def list_equipments_filtered(client, i):
+        return await client.get("/api/equipments", params={"limit": 100, "status": "Disponível"})
+
+    async def search_equipments(client, i):
+        return await client.get("/api/equipments", params={"limit": 50, "search": search_terms[i]})
+
+    async def list_loans(client, i):
+        return await client.get("/api/loans", params={"limit": 100})
+
+    async def dashboard(client, i):
+        return await client.get("/api/dashboard/stats")
+
+    async def public_catalog(client, i):
+        return await client.get("/api/public/equipments/available", params={"limit": 100})
+
+    async def loan_create(client, i):
+        response = await client.post("/api/loans", json={
+            "data_emprestimo": datetime.now(timezone.utc).isoformat(),
+            "nome_solicitante": "Benchmark",
+            "departamento_solicitante": "SEINTEC",
+            "data_prevista_devolucao": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
+            "equipments": [pool[i % len(pool)]],
+        })
+        if response.status_code == 200:
+            loan_ids.append(response.json()["id"])
+        return response
+
+    async def loan_return(client, i):
+        return await client.put(
+            f"/api/loans/{loan_ids[i]}/return",
+            json={"data_devolucao_real": datetime.now(timezone.utc).isoformat()}
+        )
+
+    async def import_equipments(client, i):
+        files = {"file": (f"bench-{i}.csv", import_csv(i, args.import_rows), "text/csv")}
+        return await client.post("/api/import/equipments", files=files)
+
+    async def export_equipments(client, i):
+        return await client.get("/api/export/equipments", params={"format": "csv"})
+
+    return [
+        ("login", args.requests, login),
+        ("list_equipments", args.requests, list_equipments),
+        ("list_equipments_filtered", args.requests, list_equipments_filtered),
+        ("search_equipments", args.requests, search_equipments),
+        ("list_loans", args.requests, list_loans),
+        ("dashboard", args.requests, dashboard),
+        ("public_catalog", args.requests, public_catalog),
+        # Each pooled equipment can only be out on one loan, so create all before returning any
+        ("loan_create", min(args.requests, len(pool)), loan_create),
+        ("loan_return", lambda: len(loan_ids), loan_return),
+        ("import_equipments", heavy_requests, import_equipments),
+        ("export_equipments", heavy_requests, export_equipments),
+    ]
+
+
+async def run_scenario(client, total, make_request, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples, errors = [], {}
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(client, i)
+            samples.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        **percentiles(samples),
+        "rps": round(total / elapsed, 1) if elapsed > 0 else None,
+        "elapsed_s": round(elapsed, 3),
+        "errors": errors,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="Use a real mongod instead of mongomock-motor")
+    parser.add_argument("--db-name", default="patrimonio_benchmark")
+    parser.add_argument("--equipments", type=int, default=10000)
+    parser.add_argument("--loans", type=int, default=10000)
+    parser.add_argument("--history", type=int, default=10000)
+    parser.add_argument("--loan-pool", type=int, default=500, help="Equipments kept available for the loan scenarios")
+    parser.add_argument("--import-rows", type=int, default=500, help="Rows per import request")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", help="Comma-separated subset of scenarios to run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    server = load_server(args)
+    # Slow-request warnings would drown the report
+    logging.getLogger("server").setLevel(logging.ERROR)
+    rng = random.Random(args.seed)
+
+    seed_started = time.perf_counter()
+    equipments = await seed(server, args, rng)
+    seed_seconds = time.perf_counter() - seed_started
+
+    selected = set(args.scenarios.split(",")) if args.scenarios else None
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+        response = await client.post("/api/auth/login", json={"username": USERNAME, "password": PASSWORD})
+        response.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+        for name, total, make_request in build_scenarios(args, equipments, rng):
+            if selected and name not in selected:
+                continue
+            total = total() if callable(total) else total
+            results[name] = await run_scenario(client, total, make_request, args.concurrency)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "backend": "mongod" if args.mongo_url else "mongomock-motor",
+            "python": platform.python_version(),
+            "equipments": args.equipments,
+            "loans": args.loans,
+            "history": args.history,
+            "requests_per_scenario": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
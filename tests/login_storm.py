@@ -0,0 +1,111 @@
+"""Login-storm load benchmark.
+
+Measures latency of a cheap authenticated endpoint while a burst of logins
+hammers bcrypt, and prints the percentiles as JSON.
+
+    python tests/login_storm.py                       # in-process, mongomock-motor
+    python tests/login_storm.py --base-url http://localhost:8001
+
+The in-process mode needs ``mongomock-motor`` installed; rate limits are
+raised for the run unless ``--keep-rate-limits`` is given, so the storm
+actually reaches bcrypt.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmark import percentiles
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+USERNAME = "dedianit"
+PASSWORD = "diadema123"
+
+
+async def make_client(args):
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=60)
+
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "login_storm")
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    if not args.keep_rate_limits:
+        for name in ("USERNAME", "IP"):
+            os.environ[f"LOGIN_RATE_LIMIT_{name}_BURST"] = "1000000"
+            os.environ[f"LOGIN_RATE_LIMIT_{name}_PER_MINUTE"] = "1000000"
+    sys.path.insert(0, str(BACKEND_DIR))
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    server.client = AsyncMongoMockClient()
+    server.db = server.client[os.environ["DB_NAME"]]
+    await server.init_db()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://benchmark", timeout=60)
+
+
+async def probe(client, headers, stop, samples):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/auth/me", headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0.005)
+
+
+async def storm(client, total, concurrency, statuses):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def attempt(i):
+        async with semaphore:
+            # Alternate good and bad passwords; both cost a full bcrypt check
+            password = PASSWORD if i % 2 else "wrong-password"
+            response = await client.post("/api/auth/login", json={"username": USERNAME, "password": password})
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    await asyncio.gather(*(attempt(i) for i in range(total)))
+
+
+async def measure(client, headers, seconds=None, logins=0, concurrency=1):
+    samples, statuses, stop = [], {}, asyncio.Event()
+    prober = asyncio.create_task(probe(client, headers, stop, samples))
+    started = time.perf_counter()
+    if logins:
+        await storm(client, logins, concurrency, statuses)
+    else:
+        await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    return {"elapsed_s": round(elapsed, 2), "probe": percentiles(samples), "login_statuses": statuses}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Run against a live server instead of in-process")
+    parser.add_argument("--logins", type=int, default=200, help="Login attempts in the storm")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent login attempts")
+    parser.add_argument("--baseline-seconds", type=float, default=2.0)
+    parser.add_argument("--keep-rate-limits", action="store_true")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    async with await make_client(args) as client:
+        response = await client.post("/api/auth/login", json={"username": USERNAME, "password": PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        result = {
+            "baseline": await measure(client, headers, seconds=args.baseline_seconds),
+            "login_storm": await measure(client, headers, logins=args.logins, concurrency=args.concurrency),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""Serialization microbenchmark for 1000-row list responses.
+
+Measures the CPU time spent turning one page of equipments or loans into
+response bytes, without touching the database:
+
+    before   response_model validation + jsonable encoding + json (the old path)
+    after    ORJSONResponse over documents read with the model projection
+    gzip     compressing the "after" body at the server's GZIP_COMPRESS_LEVEL
+
+    python tests/serialization_benchmark.py
+    python tests/serialization_benchmark.py --rows 1000 --iterations 200 --output serialization.json
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+
+from benchmark import DEPARTAMENTOS, MARCAS, NOMES, TIPOS
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+def load_server():
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "serialization_benchmark")
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    sys.path.insert(0, str(BACKEND_DIR))
+    import server
+
+    return server
+
+
+def equipment_docs(server, rows, rng):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(rows):
+        created = (start + timedelta(minutes=i)).isoformat()
+        doc = server.Equipment(
+            numero_patrimonio=f"BENCH-{i:07d}",
+            numero_serie=f"SN{rng.randrange(10 ** 9):09d}",
+            marca=rng.choice(MARCAS),
+            modelo=f"Modelo {rng.randrange(500)}",
+            tipo_equipamento=rng.choice(TIPOS),
+            departamento_atual=rng.choice(DEPARTAMENTOS),
+            created_at=created,
+            updated_at=created,
+        ).model_dump()
+        # Fields the old exclusion projection let through and the response model dropped
+        doc.update({"termo_size": rng.randrange(10 ** 6), "current_loan_id": None})
+        docs.append(doc)
+    return docs
+
+
+def loan_docs(server, rows, rng):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    docs = []
+    for i in range(rows):
+        emprestimo = start + timedelta(hours=i)
+        docs.append(server.Loan(
+            data_emprestimo=emprestimo.isoformat(),
+            nome_solicitante=rng.choice(NOMES),
+            departamento_solicitante=rng.choice(DEPARTAMENTOS),
+            data_prevista_devolucao=(emprestimo + timedelta(days=rng.randrange(1, 30))).isoformat(),
+            equipments=[f"BENCH-{rng.randrange(rows):07d}"],
+            created_at=emprestimo.isoformat(),
+        ).model_dump())
+    return docs
+
+
+def response_field(server, path):
+    for route in server.app.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.secure_cloned_response_field
+    raise LookupError(path)
+
+
+def cpu_ms(func, iterations):
+    func()
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return round((time.process_time() - start) * 1000 / iterations, 3)
+
+
+def measure(server, path, docs, list_projection, iterations, loop):
+    field = response_field(server, path)
+    full_page = {"items": docs, "next_cursor": None}
+    projected = {"items": [{key: doc.get(key) for key in list_projection if key != "_id"} for doc in docs], "next_cursor": None}
+
+    def before():
+        content = loop.run_until_complete(serialize_response(field=field, response_content=full_page))
+        return JSONResponse(content).body
+
+    def after():
+        return ORJSONResponse(projected).body
+
+    body = after()
+    return {
+        "before_ms": cpu_ms(before, iterations),
+        "after_ms": cpu_ms(after, iterations),
+        "gzip_ms": cpu_ms(lambda: gzip.compress(body, server.GZIP_COMPRESS_LEVEL), iterations),
+        "body_bytes": len(body),
+        "gzip_bytes": len(gzip.compress(body, server.GZIP_COMPRESS_LEVEL)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    server = load_server()
+    rng = random.Random(args.seed)
+    loop = asyncio.new_event_loop()
+    report = {
+        "meta": {"rows": args.rows, "iterations": args.iterations, "python": sys.version.split()[0]},
+        "equipments": measure(
+            server, "/api/equipments", equipment_docs(server, args.rows, rng),
+            server.EQUIPMENT_LIST_PROJECTION, args.iterations, loop
+        ),
+        "loans": measure(
+            server, "/api/loans", loan_docs(server, args.rows, rng),
+            server.LOAN_LIST_PROJECTION, args.iterations, loop
+        ),
+    }
+    loop.close()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()